@@ -14,4 +14,5 @@ from .coreType import *
 from .namedIndex import *
 from .structArray import *
 from .table import *
+from .hdfTable import *
 
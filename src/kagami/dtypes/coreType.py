@@ -12,9 +12,9 @@ added: 08-23-2018
 
 import pickle
 import numpy as np
-from typing import Tuple, Sequence, Union, Optional
+from typing import Tuple, Sequence, Callable, Union, Optional
 from copy import deepcopy
-from kagami.comm import pickmap
+from kagami.comm import pickmap, available
 
 
 __all__ = ['CoreType', 'Indices', 'Indices2D']
@@ -113,11 +113,13 @@ class CoreType:
     def tostring(self):
         raise NotImplementedError(f'method not implemented for {self.__class__.__name__}')
 
-    def dump(self, file, protocol = None) -> None:
-        return pickle.dump(self, file = file, protocol = protocol)
+    def dump(self, file, protocol = None, buffer_callback: Optional[Callable] = None) -> None:
+        if available(buffer_callback) and protocol is None: protocol = 5
+        return pickle.dump(self, file = file, protocol = protocol, buffer_callback = buffer_callback)
 
-    def dumps(self, protocol = None) -> bytes:
-        return pickle.dumps(self, protocol = protocol)
+    def dumps(self, protocol = None, buffer_callback: Optional[Callable] = None) -> bytes:
+        if available(buffer_callback) and protocol is None: protocol = 5
+        return pickle.dumps(self, protocol = protocol, buffer_callback = buffer_callback)
 
     def copy(self):
         return deepcopy(self)
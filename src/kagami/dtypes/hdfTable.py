@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+hdfTable
+
+author(s): Albert (aki) Zhou
+added: 10-18-2026
+
+"""
+
+
+from __future__ import annotations
+
+import numpy as np
+import tables as ptb
+from typing import Tuple, Union, Optional
+from pathlib import Path
+from collections import OrderedDict
+from kagami.comm import optional, missing, available, checkInputFile, Metadata
+from .coreType import CoreType, Indices2D
+from .namedIndex import NamedIndex
+from .structArray import StructuredArray
+from .table import Table
+
+
+__all__ = ['HDFTable']
+
+
+# lazy table handle
+class HDFTable(CoreType):
+    __slots__ = ('_fname', '_hdf', '_rnames', '_cnames', '_rindex', '_cindex', '_metas', '_dshape', '_dtype', '_bshape', '_cache', '_csize')
+
+    def __init__(self, fname: Union[str, Path], *, blockshape: Optional[Tuple[int, int]] = None, cachesize: int = 32):
+        checkInputFile(fname)
+        self._fname = fname
+        self._hdf = ptb.open_file(fname, mode = 'r')
+
+        root = self._hdf.root
+        self._rnames = NamedIndex(Table._hdfdecode(root.RowNames.read())) if hasattr(root, 'RowNames') else None
+        self._cnames = NamedIndex(np.array(root.ColNames.read(), dtype = str)) if hasattr(root, 'ColNames') else None
+        self._rindex = StructuredArray.fromhtable(root.RowIndex) if hasattr(root, 'RowIndex') else None
+        self._cindex = StructuredArray.fromhtable(root.ColIndex) if hasattr(root, 'ColIndex') else None
+        self._metas = Metadata([(n, getattr(root.DataMatx.attrs, n)) for n in root.DataMatx.attrs._f_list('user')])
+        self._dshape = tuple(root.DataMatx.shape)
+        self._dtype = np.dtype(f'<U{root.DataMatx.atom.itemsize}') if root.DataMatx.atom.dtype.kind == 'S' else root.DataMatx.atom.dtype
+
+        self._bshape = optional(blockshape, (512, 512))
+        self._cache = OrderedDict()
+        self._csize = cachesize
+
+    # privates
+    _mapids = staticmethod(Table._mapids)
+    _parseids = Table._parseids
+
+    def _block(self, rb, cb):
+        if (rb, cb) in self._cache:
+            self._cache.move_to_end((rb, cb))
+            return self._cache[(rb, cb)]
+
+        br, bc = self._bshape
+        blk = self._hdf.root.DataMatx[rb*br:(rb+1)*br, cb*bc:(cb+1)*bc]
+        if blk.dtype.kind == 'S': blk = Table._hdfdecode(blk)
+        self._cache[(rb, cb)] = blk
+        if len(self._cache) > self._csize: self._cache.popitem(last = False)
+        return blk
+
+    # built-ins
+    def __getitem__(self, item):
+        return self.take(item, axis = None)
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        return repr(self)
+
+    def __repr__(self):
+        return f'HDFTable({self._fname}, size = ({self.nrow}, {self.ncol}))'
+
+    # properties
+    @property
+    def rows_(self):
+        return self._rnames
+
+    @property
+    def cols_(self):
+        return self._cnames
+
+    @property
+    def ridx_(self):
+        return self._rindex
+
+    @property
+    def cidx_(self):
+        return self._cindex
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def metadata(self):
+        return self._metas
+
+    @property
+    def size(self):
+        return self.shape[0]
+
+    @property
+    def shape(self):
+        return self._dshape
+
+    @property
+    def nrow(self):
+        return self.shape[0]
+
+    @property
+    def ncol(self):
+        return self.shape[1]
+
+    @property
+    def ndim(self):
+        return 2
+
+    # publics
+    def take(self, pos: Indices2D, axis: Optional[int] = 0) -> Table:
+        if missing(self._hdf): raise IOError('hdf file already closed')
+        rids, cids = self._parseids(pos, axis = axis)
+        rids, cids = np.arange(self.nrow)[rids], np.arange(self.ncol)[cids]
+
+        # fill from the cached blocks touched by the selection
+        br, bc = self._bshape
+        rblk, cblk = rids // br, cids // bc
+        dmtx = np.empty((rids.shape[0], cids.shape[0]), dtype = self.dtype)
+        for rb in np.unique(rblk):
+            rsel = np.where(rblk == rb)[0]
+            for cb in np.unique(cblk):
+                csel = np.where(cblk == cb)[0]
+                dmtx[np.ix_(rsel, csel)] = self._block(rb, cb)[np.ix_(rids[rsel] - rb*br, cids[csel] - cb*bc)]
+
+        return Table(
+            dmtx, copy = False,
+            rownames = self._rnames[rids] if available(self._rnames) else None,
+            colnames = self._cnames[cids] if available(self._cnames) else None,
+            rowindex = self._rindex[:,rids] if available(self._rindex) else None,
+            colindex = self._cindex[:,cids] if available(self._cindex) else None,
+            metadata = self._metas,
+        )
+
+    def close(self) -> None:
+        if missing(self._hdf): return
+        self._hdf.close()
+        self._hdf = None
+        self._cache.clear()
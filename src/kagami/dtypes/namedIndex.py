@@ -13,25 +13,88 @@ added: 08-23-2018
 from __future__ import annotations
 
 import numpy as np
-from typing import List, Tuple, Iterable, Union
-from kagami.comm import l, ll, optional, missing, isstring, iterable, listable, checkany, paste
+import pandas as pd
+from typing import List, Tuple, Iterable, Union, Optional
+from kagami.comm import l, ll, optional, missing, available, isstring, iterable, listable, checkany, paste, validarg
 from .coreType import CoreType, Indices
 
 
 __all__ = ['NamedIndex']
 
 
+_copy = lambda x: None if x is None else x.copy()
+_encode = lambda x: x if isinstance(x, np.ndarray) and x.dtype.kind == 'S' else np.char.encode(np.asarray(x, dtype = str), 'utf-8')
+_decode = lambda x: x.decode('utf-8') if isinstance(x, bytes) else \
+                    np.char.decode(x, 'utf-8').astype(object) if isinstance(x, np.ndarray) and x.dtype.kind == 'S' else x
+_strs = lambda x: np.char.decode(x, 'utf-8') if x.dtype.kind == 'S' else x.astype(str)
+
+
 class NamedIndex(CoreType):
-    __slots__ = ('_names', '_nidct')
+    __slots__ = ('_names', '_nidct', '_sorted', '_shared')
 
-    def __init__(self, names: Iterable[str] = ()):
-        self._names = self._nidct = None
+    def __init__(self, names: Iterable[str] = (), *, compact: Optional[bool] = None):
+        self._names = self._nidct = self._sorted = None
+        self._shared = False
         self.names = names
+        if available(compact): self.compact = compact
 
     # private
     def _reindex(self, check = True):
-        self._nidct = {n: i for i,n in enumerate(self._names)}  # much faster than dict()
-        if check and len(self._names) != len(self._nidct): raise KeyError('index names not unique')
+        self._nidct = self._sorted = None # lookup tables are rebuilt lazily on first use
+        if not check: return
+        if self.compact:
+            snam = self._engine()[0] # compact names never get a hash, the sorted engine is needed anyway
+            if np.any(snam[1:] == snam[:-1]): raise KeyError('index names not unique')
+        elif pd.unique(self._names).shape[0] != self._names.shape[0]: raise KeyError('index names not unique')
+
+    def _hash(self):
+        if missing(self._nidct): self._nidct = {n: i for i,n in enumerate(self._names)}  # much faster than dict()
+        return self._nidct
+
+    def _engine(self):
+        # sorted names with their positions for vectorized lookups, built on first use and dropped when names change
+        if missing(self._sorted):
+            snam = self._names if self.compact else _strs(self._names)
+            sids = np.argsort(snam, kind = 'stable')
+            self._sorted = (snam[sids], sids)
+        return self._sorted
+
+    def _lookup(self, names):
+        names = (names if names.dtype.kind == 'S' else _encode(names)) if self.compact else _strs(names)
+        snam, sids = self._engine()
+        if snam.shape[0] == 0: return np.full(names.shape[0], -1)
+        pos = np.searchsorted(snam, names)
+        pos[pos == snam.shape[0]] = 0
+        return np.where(snam[pos] == names, sids[pos], -1)
+
+    def _find(self, name):
+        if not self.compact: return self._hash().get(name, None)
+        ids = self._lookup(np.array([name]))[0]
+        return None if ids < 0 else int(ids)
+
+    def _widen(self, val):
+        # compact buffer has a fixed width, longer names need a wider copy
+        if not self.compact: return val
+        val = _encode(val)
+        if val.dtype.itemsize > self._names.dtype.itemsize: self._names, self._shared = self._names.astype(val.dtype), False
+        return val
+
+    def _unshare(self):
+        if not self._shared: return
+        self._names, self._nidct, self._shared = self._names.copy(), _copy(self._nidct), False
+
+    def _subset(self, pos):
+        nid = NamedIndex()
+        nid._names = self._names[pos]
+        if not isinstance(pos, slice):
+            pos = np.asarray(pos)
+            nid._reindex(check = False)
+            # subset of unique names is unique unless positions repeat, checking integers is much cheaper
+            if pos.dtype.kind != 'b' and np.unique(pos % max(self.size, 1)).shape[0] != pos.shape[0]: raise KeyError('index names not unique')
+            return nid
+        nid._reindex(check = False) # slice of unique names is always unique
+        nid._shared = self._shared = True # names buffer shared until either side modifies it
+        return nid
 
     def _parseids(self, ids):
         if isinstance(ids, tuple): raise IndexError('too many dimensions for array')
@@ -43,10 +106,12 @@ class NamedIndex(CoreType):
     @staticmethod
     def _parsevals(value, arrayonly = False):
         if isinstance(value, NamedIndex):
-            val = value._names
+            val = _decode(value._names)
+        elif isinstance(value, np.ndarray) and value.dtype.kind == 'U' and value.ndim == 1:
+            val = value.astype(object) # no need to check str arrays
         elif iterable(value):
             val = np.asarray(ll(value), dtype = object)
-            if checkany(val, lambda x: not isstring(x)): raise TypeError('index names must be string')
+            if val.ndim != 1 or pd.api.types.infer_dtype(val, skipna = False) not in ('string', 'empty'): raise TypeError('index names must be string')
         else:
             if arrayonly: raise TypeError('index names must be an array')
             if not isstring(value): raise TypeError('index name must be a string')
@@ -64,33 +129,39 @@ class NamedIndex(CoreType):
         self.delete(key, inline = True)
 
     def __getattr__(self, item):
-        return self._nidct[item] if item in self else super().__getattribute__(item)
+        return self._find(item) if item in self else super().__getattribute__(item)
 
     def __iter__(self):
-        return iter(self._names)
+        return map(_decode, self._names) if self.compact else iter(self._names)
 
     def __contains__(self, item):
-        return item in self._names
+        return isstring(item) and available(self._find(item))
 
     def __len__(self):
         return self.size
 
     def __eq__(self, other):
-        if isinstance(other, NamedIndex): other = other._names
-        return self._names == other
+        if isinstance(other, NamedIndex): other = _decode(other._names)
+        return _decode(self._names) == other
 
     def __str__(self):
-        return str(self._names)
+        return str(_decode(self._names))
 
     def __repr__(self):
-        rlns = str(self._names).split('\n')
+        rlns = str(_decode(self._names)).split('\n')
         rlns = [f'NamedIndex({rlns[0]}'] + \
                [f'           {ln}' for ln in rlns[1:]]
         return paste(rlns, sep = '\n') + f', size = {self.size})'
 
     # for numpy
+    def __getstate__(self):
+        return dict(super().__getstate__(), _nidct = None, _sorted = None, _shared = False)
+
+    def __setstate__(self, dct):
+        super().__setstate__(dict(dct, _nidct = None, _sorted = None, _shared = False)) # lookup tables are rebuilt lazily
+
     def __array__(self, dtype = None):
-        return self._names.astype(optional(dtype, str))
+        return _decode(self._names).astype(optional(dtype, str))
 
     def __array_wrap__(self, arr):
         return NamedIndex(arr)
@@ -98,15 +169,30 @@ class NamedIndex(CoreType):
     # properties
     @property
     def names(self) -> np.ndarray:
-        return self._names.copy() # DO NOT use _names[:] -> does not make deep copy for obj array
+        return _decode(self._names) if self.compact else self._names.copy() # DO NOT use _names[:] -> does not make deep copy for obj array
 
     @names.setter
     def names(self, value: Iterable[str]) -> None:
         if isinstance(value, NamedIndex):
-            self._names, self._nidct = value._names.copy(), value._nidct.copy()
+            self._names, self._nidct, self._sorted = value._names, value._nidct, value._sorted
+            self._shared = value._shared = True
         else:
-            self._names = self._parsevals(value, arrayonly = True).copy()
+            names = self._parsevals(value, arrayonly = True)
+            self._names = _encode(names) if self.compact else names.copy()
             self._reindex()
+            self._shared = False
+
+    @property
+    def compact(self) -> bool:
+        return available(self._names) and self._names.dtype.kind == 'S'
+
+    @compact.setter
+    def compact(self, value: bool) -> None:
+        # utf-8 names in one fixed width buffer instead of python str objects, looked up by binary search
+        if value == self.compact: return
+        self._names = _encode(self._names) if value else _decode(self._names)
+        self._nidct = self._sorted = None
+        self._shared = False
 
     @property
     def size(self) -> int:
@@ -123,44 +209,99 @@ class NamedIndex(CoreType):
     # public
     @staticmethod
     def uniquenames(names: Iterable[str], suffix: str = '.{}') -> np.ndarray:
-        names = NamedIndex._parsevals(names, arrayonly = True)
+        names = NamedIndex._parsevals(names, arrayonly = True).copy()
+
+        codes, unam = pd.factorize(names)
+        if unam.shape[0] == names.shape[0]: return names
 
-        unam, cnts = np.unique(names, return_counts = True)
-        if np.all(cnts == 1): return names
+        # occurrence rank of each name within its group, the first one is kept as is
+        ords = np.argsort(codes, kind = 'stable')
+        scod = codes[ords]
+        heads = np.r_[True, scod[1:] != scod[:-1]]
+        ranks = np.empty_like(ords)
+        ranks[ords] = np.arange(ords.shape[0]) - np.maximum.accumulate(np.where(heads, np.arange(ords.shape[0]), 0))
 
-        cdct = {n:c for n,c in zip(unam, cnts-1)}
-        for i,n in enumerate(names[::-1]):
-            c = cdct[n]
-            if c > 0: names[-i-1], cdct[n] = n + suffix.format(c), c - 1
+        dups = ranks > 0
+        sufs = np.array([suffix.format(i) for i in range(np.max(ranks) + 1)])
+        names[dups] = np.char.add(names[dups].astype(str), sufs[ranks[dups]]).astype(object)
         return names
 
     def namesof(self, pos: Indices) -> Union[str, np.ndarray]:
-        return self._names[self._parseids(pos)]
+        return _decode(self._names[self._parseids(pos)])
 
-    def idsof(self, names: Union[str, Iterable[str]], safe: bool = False) -> Union[None, int, List[Union[None, int]]]:
+    def idsof(self, names: Union[str, Iterable[str]], safe: bool = False) -> Union[None, int, np.ndarray, List[int]]:
         if isstring(names):
-            ids = self._nidct.get(names, None)
+            ids = self._find(names)
             if not safe and missing(ids): raise KeyError(f'unknown index name {names}')
+            return ids
+
+        names = names if isinstance(names, np.ndarray) else np.asarray(ll(names), dtype = object)
+        if names.dtype.kind in ('U', 'S') or pd.api.types.infer_dtype(names, skipna = False) in ('string', 'empty'):
+            ids = self._lookup(names) # unknown names marked as -1
+            if not safe and np.any(ids < 0): raise KeyError('unknown index name(s)')
         else:
-            ids = [self._nidct.get(n, None) if isstring(n) else n for n in names]
-            if not safe and checkany(ids, missing): raise KeyError('unknown index name(s)')
+            # mixed names and positions, negative positions are wrapped so that -1 only marks unknown names
+            smsk = np.fromiter(map(isstring, names), dtype = bool, count = names.shape[0])
+            ids, pos = np.empty(names.shape[0], dtype = int), names[~smsk].astype(int)
+            ids[smsk], ids[~smsk] = self._lookup(names[smsk].astype(str)), np.where(pos < 0, pos + self.size, pos)
+            if not safe and np.any(ids[smsk] < 0): raise KeyError('unknown index name(s)')
         return ids
 
+    def intersect(self, other: Union[NamedIndex, Iterable[str]]) -> NamedIndex:
+        other = other if isinstance(other, NamedIndex) else NamedIndex(other)
+        return self._subset(np.where(other._lookup(self._names) >= 0)[0])
+
+    def union(self, other: Union[NamedIndex, Iterable[str]]) -> NamedIndex:
+        other = other if isinstance(other, NamedIndex) else NamedIndex(other)
+        nid = NamedIndex()
+        onam = other._names[self._lookup(other._names) < 0]
+        nid._names = np.hstack([self._names, _encode(onam) if self.compact else _decode(onam)])
+        nid._reindex(check = False)
+        return nid
+
+    def difference(self, other: Union[NamedIndex, Iterable[str]]) -> NamedIndex:
+        other = other if isinstance(other, NamedIndex) else NamedIndex(other)
+        return self._subset(np.where(other._lookup(self._names) < 0)[0])
+
+    def align(self, other: Union[NamedIndex, Iterable[str]], how: str = 'inner') -> Tuple[NamedIndex, np.ndarray, np.ndarray]:
+        # positions of the aligned names in both sides, -1 for names missing on one side
+        other = other if isinstance(other, NamedIndex) else NamedIndex(other)
+        validarg(how, ('inner', 'left', 'right', 'outer'))
+
+        if how == 'right':
+            nid, rids = other.copy(), np.arange(other.size)
+            lids = self._lookup(other._names)
+        else:
+            rids = other._lookup(self._names)
+            if how == 'inner':
+                lids = np.where(rids >= 0)[0]
+                nid, rids = self._subset(lids), rids[lids]
+            elif how == 'left':
+                nid, lids = self.copy(), np.arange(self.size)
+            else:
+                nid = self.union(other)
+                lids = np.hstack([np.arange(self.size), np.full(nid.size - self.size, -1)])
+                rids = other._lookup(nid._names)
+        return nid, lids, rids
+
     def take(self, pos: Indices) -> Union[str, NamedIndex]:
         pos = self._parseids(pos)
-        return self._names[pos] if isinstance(pos, int) else NamedIndex(self._names[pos])
+        return _decode(self._names[pos]) if isinstance(pos, int) else self._subset(pos)
 
     def put(self, pos: Indices, value: Union[str, Iterable[str]], inline: bool = False) -> NamedIndex:
         pos = self._parseids(pos)
         val = self._parsevals(value)
         nid = self if inline else self.copy()
+        nid._unshare()
         if isinstance(pos, int):
             if not isstring(val): raise TypeError('cannot assign multiple names to one position')
-            nid._nidct.pop(nid._names[pos])
-            if val in nid._nidct: raise KeyError('index names not unique')
-            nid._names[pos], nid._nidct[val] = val, pos
+            ids = nid._find(val)
+            if available(ids) and ids != pos % nid.size: raise KeyError('index names not unique')
+            if available(nid._nidct): nid._nidct.pop(nid._names[pos]); nid._nidct[val] = pos % nid.size
+            nid._names[pos] = nid._widen(val)
+            nid._sorted = None
         else:
-            nid._names[pos] = val
+            nid._names[pos] = nid._widen(val)
             nid._reindex()
         return nid
 
@@ -169,10 +310,16 @@ class NamedIndex(CoreType):
         if not listable(val): val = [val]
 
         nid = self if inline else self.copy()
-        for i,n in enumerate(val): nid._nidct[n] = nid.size + i
-        nid._names = np.hstack([nid._names, val])
+        if missing(nid._nidct):
+            nid._names, nid._shared = np.hstack([nid._names, _encode(val) if nid.compact else val]), False
+            nid._reindex()
+            return nid
 
-        if len(nid._names) != len(nid._nidct): raise KeyError('index names not unique')
+        # extend the existing name hash instead of rebuilding it
+        dct = nid._nidct.copy() if nid._shared else nid._nidct
+        for i,n in enumerate(val): dct[n] = nid.size + i
+        if len(dct) != nid.size + len(val): raise KeyError('index names not unique')
+        nid._names, nid._nidct, nid._sorted, nid._shared = np.hstack([nid._names, val]), dct, None, False
         return nid
 
     def insert(self, pos: Indices, value: Union[str, Iterable[str]], inline: bool = False) -> NamedIndex:
@@ -180,25 +327,29 @@ class NamedIndex(CoreType):
         pos = self._parseids(pos)
         val = self._parsevals(value)
         nid = self if inline else self.copy()
-        nid._names = np.insert(nid._names, pos, val)
+        val = nid._widen(val)
+        nid._names, nid._shared = np.insert(nid._names, pos, val), False
         nid._reindex()
         return nid
 
     def delete(self, pos: Indices, inline: bool = False) -> NamedIndex:
         pos = self._parseids(pos)
         nid = self if inline else self.copy()
-        nid._names = np.delete(self._names, pos)
+        nid._names, nid._shared = np.delete(self._names, pos), False
         nid._reindex(check = False)
         return nid
 
     def tolist(self) -> List:
-        return l(self._names.tolist())
+        return l(_decode(self._names).tolist())
 
     def tostring(self) -> bytes:
         return self._names.tobytes()
 
+    def encode(self) -> np.ndarray:
+        return self._names.copy() if self.compact else _encode(self._names)
+
     def copy(self) -> NamedIndex:
         nid = NamedIndex()
-        nid._names = self._names.copy()
-        nid._nidct = self._nidct.copy()
+        nid._names, nid._nidct, nid._sorted = self._names, self._nidct, self._sorted
+        nid._shared = self._shared = True
         return nid
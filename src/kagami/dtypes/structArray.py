@@ -12,14 +12,15 @@ added: 08-23-2018
 
 from __future__ import annotations
 
-import os, re
+import os, re, ast
 import numpy as np
 import pandas as pd
 import tables as tb
-from typing import List, Tuple, Iterable, Mapping, Union, Optional, Any
+from typing import List, Tuple, Dict, Iterable, Mapping, Union, Optional, Any
 from pathlib import Path
+from itertools import chain
 from collections import OrderedDict
-from kagami.comm import l, ll, available, missing, checkall, checkany, iterable, listable, ismapping, isstring, smap, unpack, paste, checkInputFile, checkOutputFile
+from kagami.comm import l, ll, optional, available, missing, checkall, checkany, iterable, listable, ismapping, isstring, smap, unpack, paste, validarg, checkInputFile, checkOutputFile
 from kagami.portals import tablePortal
 from .coreType import CoreType, Indices, Indices2D
 
@@ -27,11 +28,22 @@ from .coreType import CoreType, Indices, Indices2D
 __all__ = ['StructuredArray']
 
 
+_cmpops = {ast.Eq: np.equal, ast.NotEq: np.not_equal, ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+           ast.In: np.isin, ast.NotIn: lambda x,y: np.isin(x, y, invert = True)}
+_binops = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide, ast.FloorDiv: np.floor_divide, ast.Mod: np.mod, ast.Pow: np.power}
+_flipops = {ast.Eq: ast.Eq, ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE}
+_cmpkind = lambda x: 'n' if x in 'biufc' else 's' if x in 'US' else x
+
+
 class StructuredArray(CoreType):
-    __slots__ = ('_arrs', '_length')
+    __slots__ = ('_arrs', '_length', '_blocks', '_cats', '_fidx', '_shared', '_viewed')
 
     def __init__(self, items: Optional[Union[Iterable, Mapping, np.ndarray, StructuredArray]] = None, **kwargs: Iterable):
-        if isinstance(items, StructuredArray): self._arrs, self._length = items._arrs.copy(), items._length; return
+        self._shared, self._viewed = set(), set()
+        self._blocks = None
+        self._cats = {}
+        self._fidx = {}
+        if isinstance(items, StructuredArray): items._share(self); return
 
         vals = [(k, items[k]) for k in items.dtype.names] if isinstance(items, np.ndarray) and available(items.dtype.names) else \
                items.items()  if ismapping(items) else \
@@ -44,6 +56,204 @@ class StructuredArray(CoreType):
         for k,v in vals: self[k] = v
 
     # privates
+    def _unshare(self, keys = None):
+        keys = self._shared.intersection(optional(keys, self._shared))
+        for blk in optional(self._blocks, []):
+            if keys.isdisjoint(blk[1]): continue
+            blk[0] = blk[0].copy() # fields in a block are copied together
+            self._rebind(blk)
+            keys.difference_update(blk[1])
+            self._shared.difference_update(blk[1])
+        for k in keys: self._arrs[k] = self._arrs[k].copy()
+        self._shared.difference_update(keys)
+
+    def _rebind(self, blk):
+        buf, cols = blk
+        for k,j in cols.items(): self._arrs[k] = buf[:self._length,j]
+
+    def _blockkeys(self):
+        return set(chain.from_iterable(cols.keys() for _,cols in optional(self._blocks, [])))
+
+    @staticmethod
+    def _catencode(vals, cats):
+        # codes of values in the categories, unseen values extend the categories
+        vals = np.asarray(vals)
+        _index = lambda x: pd.Index(x, dtype = object) if cats.dtype.kind == 'O' else pd.Index(x) # object categories may hold None, not inferred as strings
+        cids = _index(cats).get_indexer(_index(vals.ravel()))
+        if np.any(cids < 0):
+            cats = np.hstack([cats, np.asarray(pd.unique(vals.ravel()[cids < 0])).astype(vals.dtype)])
+            cids = _index(cats).get_indexer(_index(vals.ravel()))
+        return cids.reshape(vals.shape).astype(np.min_scalar_type(-max(cats.shape[0], 1))), cats
+
+    def _touch(self, keys = None):
+        # field indexes are rebuilt on the next lookup after their fields change
+        for k in optional(keys, l(self._fidx.keys())):
+            if k in self._fidx: self._fidx[k][1] = None
+
+    def _findex(self, key):
+        kind, eng = self._fidx[key]
+        if available(eng): return kind, eng
+
+        vals = self._values(key)
+        if kind == 'sorted':
+            ords = np.argsort(vals, kind = 'stable')
+            if vals.dtype.kind in 'fcmM': ords = ords[~pd.isna(vals[ords])] # nan / nat sorted last, never within a range
+            eng = (vals[ords], ords)
+        else:
+            codes, uniq = pd.factorize(vals, use_na_sentinel = False)
+            ords = np.argsort(codes, kind = 'stable')
+            eng = dict(zip(uniq, np.split(ords, np.cumsum(np.bincount(codes, minlength = uniq.shape[0]))[:-1])))
+        self._fidx[key][1] = eng
+        return kind, eng
+
+    def _qindex(self, node):
+        # positions of a single comparison between an indexed field and a literal, None if the index cannot serve it
+        if not isinstance(node, ast.Compare) or len(node.ops) != 1: return None
+        (left, right), op = (node.left, node.comparators[0]), type(node.ops[0])
+        if not isinstance(left, ast.Name): (left, right), op = (right, left), _flipops.get(op)
+        if not isinstance(left, ast.Name) or left.id not in self._fidx or missing(op): return None
+        try: val = ast.literal_eval(right)
+        except ValueError: return None
+
+        seq = isinstance(val, (list, tuple, set))
+        fknd = (self._cats[left.id] if left.id in self._cats else self._arrs[left.id]).dtype.kind
+        if fknd == 'O' or _cmpkind(fknd) != _cmpkind(np.asarray(l(val) if seq else val).dtype.kind): return None # type mismatches left to numpy, which raises or matches nothing
+        kind, eng = self._findex(left.id)
+        if op is ast.Eq: return None if seq else self.lookup(left.id, val) # sequences compare elementwise
+        if op is ast.In: return self.lookup(left.id, l(val) if seq else val) # scalars are matched whole, as np.isin does
+        if kind != 'sorted' or op not in (ast.Lt, ast.LtE, ast.Gt, ast.GtE): return None
+        svals, ords = eng
+        side = 'left' if op in (ast.Lt, ast.GtE) else 'right'
+        return np.sort(ords[:np.searchsorted(svals, val, side)] if op in (ast.Lt, ast.LtE) else ords[np.searchsorted(svals, val, side):])
+
+    def _qmask(self, node):
+        ids = self._qindex(node)
+        if missing(ids): return np.broadcast_to(self._qeval(node), (self._length,)).astype(bool)
+        mask = np.zeros(self._length, dtype = bool)
+        mask[ids] = True
+        return mask
+
+    def _qeval(self, node):
+        if isinstance(node, ast.BoolOp):
+            _op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return _op.reduce([self._qmask(v) for v in node.values])
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not): return np.logical_not(self._qmask(node.operand))
+            if isinstance(node.op, ast.USub): return np.negative(self._qeval(node.operand))
+            if isinstance(node.op, ast.UAdd): return self._qeval(node.operand)
+        if isinstance(node, ast.Compare):
+            mask, left = True, self._qeval(node.left)
+            for op,comp in zip(node.ops, node.comparators):
+                if type(op) not in _cmpops: raise ValueError(f'unsupported operator [{type(op).__name__}] in query')
+                right = self._qeval(comp)
+                mask, left = np.logical_and(mask, _cmpops[type(op)](left, right)), right
+            return mask
+        if isinstance(node, ast.BinOp) and type(node.op) in _binops:
+            return _binops[type(node.op)](self._qeval(node.left), self._qeval(node.right))
+        if isinstance(node, ast.Name):
+            if node.id not in self._arrs: raise KeyError(f'unknown field name {node.id}')
+            return self._values(node.id)
+        if isinstance(node, ast.Constant): return node.value
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)): return [self._qeval(e) for e in node.elts]
+        raise ValueError(f'unsupported syntax [{type(node).__name__}] in query')
+
+    def _values(self, key):
+        return self._cats[key][self._arrs[key]] if key in self._cats else self._arrs[key]
+
+    def _catcodes(self, key, vals):
+        codes, self._cats[key] = self._catencode(vals, self._cats[key])
+        if codes.dtype.itemsize > self._arrs[key].dtype.itemsize:
+            arr = self._arrs[key].astype(codes.dtype) # more categories than the codes can hold
+            self._detach(key)
+            self._arrs[key] = arr
+            self._shared.discard(key)
+        return codes
+
+    def _detach(self, key):
+        if missing(self._blocks): return
+        for blk in self._blocks: blk[1].pop(key, None)
+        self._blocks = [blk for blk in self._blocks if len(blk[1]) > 0]
+
+    def _field(self, key):
+        if key in self._cats or key in self._fidx:
+            arr = self._values(key).view()
+            arr.flags.writeable = False # decoded copy of a categorical field or an indexed field, writes must go through put
+            return arr
+        self._unshare([key])
+        self._viewed.add(key) # buffer handed out, later copies cannot share it
+        return self._arrs[key]
+
+    def _bind(self, key, arr):
+        # attach an external buffer as field without copying, it is copied before the first write
+        if missing(self._length): self._length = arr.shape[0]
+        elif self._length != arr.shape[0]: raise ValueError('input array size not match')
+        self._detach(key)
+        self._cats.pop(key, None)
+        self._touch([key])
+        self._arrs[key] = arr
+        self._shared.add(key)
+
+    def _share(self, narr):
+        narr._arrs, narr._length = self._arrs.copy(), self._length
+        narr._blocks = None if missing(self._blocks) else [[buf, cols.copy()] for buf,cols in self._blocks]
+        narr._cats = self._cats.copy() # categories are never modified in place
+        narr._fidx = {k: l(v) for k,v in self._fidx.items()}
+        narr._shared, narr._viewed = set(narr._arrs.keys()), set() # fields shared until either side modifies them
+        narr._unshare(self._viewed) # buffers handed out may be modified in place, cannot defer the copy
+        self._shared.update(narr._shared)
+        return narr
+
+    def _subset(self, sids, aids):
+        narr = StructuredArray()
+        if missing(self._blocks):
+            narr._arrs = OrderedDict([(k, self._arrs[k][aids]) for k in sids])
+        else:
+            # one gather per block instead of one per field
+            narr._arrs, narr._blocks = OrderedDict([(k, None) for k in sids]), []
+            rids = aids if isinstance(aids, slice) else np.asarray(aids)
+            if not isinstance(rids, slice): rids = np.where(rids)[0] if rids.dtype.kind == 'b' else rids.astype(int, copy = False)
+            for buf,cols in self._blocks:
+                sels = [k for k in sids if k in cols]
+                if len(sels) == 0: continue
+                buf = buf[:self._length]
+                if isinstance(rids, slice): narr._blocks.append([buf[rids], {k: cols[k] for k in sels}]); continue
+                buf = buf.take(rids, axis = 0) if len(sels) == len(cols) else np.stack([buf[:,cols[k]].take(rids) for k in sels], axis = 1)
+                narr._blocks.append([buf, {k: cols[k] for k in sels} if len(sels) == len(cols) else {k: j for j,k in enumerate(sels)}])
+            bkeys = narr._blockkeys()
+            for k in sids:
+                if k not in bkeys: narr._arrs[k] = self._arrs[k][aids]
+            if len(narr._blocks) > 0: narr._length = narr._blocks[0][0].shape[0]
+            for blk in narr._blocks: narr._rebind(blk)
+        narr._length = len(narr._arrs[sids[0]]) if len(sids) > 0 else None
+        narr._cats = {k: self._cats[k] for k in sids if k in self._cats}
+        narr._fidx = {k: [self._fidx[k][0], None] for k in sids if k in self._fidx}
+        if isinstance(aids, slice):
+            narr._shared = set(narr._arrs.keys())
+            self._shared.update(narr._shared)
+        return narr
+
+    def _insertblocks(self, pos, fvals, nlen):
+        nold = self._length
+        for blk in self._blocks:
+            buf, cols = blk
+            if available(pos):
+                rows = np.empty((nlen, len(cols)), dtype = buf.dtype)
+                for k,j in cols.items(): rows[:,j] = fvals[k]
+                blk[0] = np.insert(buf[:nold], pos, rows, axis = 0)
+                continue
+            if buf.shape[0] < nold + nlen or not self._shared.isdisjoint(cols.keys()):
+                nbuf = np.empty((max(buf.shape[0] * 2, nold + nlen), len(cols)), dtype = buf.dtype) # amortized growth
+                nbuf[:nold] = buf[:nold]
+                blk[0] = buf = nbuf
+            for k,j in cols.items(): buf[nold:nold+nlen,j] = fvals[k]
+
+        bkeys = self._blockkeys()
+        _upd = (lambda x,y: np.insert(x, pos, y)) if available(pos) else (lambda x,y: np.hstack([x, y]))
+        for k,v in fvals.items():
+            if k not in bkeys: self._arrs[k] = _upd(self._arrs[k], v)
+        self._length = self._blocks[0][0].shape[0] if available(pos) and len(self._blocks) > 0 else nold + nlen
+        for blk in self._blocks: self._rebind(blk)
+
     def _parseids(self, idx, axis = None, mapslice = True):
         if missing(axis):
             sids, aids = (idx, slice(None)) if not isinstance(idx, tuple) else \
@@ -64,7 +274,7 @@ class StructuredArray(CoreType):
         return sids, aids
 
     def _parsevals(self, value):
-        if isinstance(value, StructuredArray): return [value._arrs[n].copy() for n in self._arrs.keys()]
+        if isinstance(value, StructuredArray): return [value._values(n) for n in self._arrs.keys()]
         if not iterable(value): return value
 
         value = ll(value)
@@ -85,7 +295,7 @@ class StructuredArray(CoreType):
         self.delete(key, axis = None, inline = True)
 
     def __getattr__(self, item):
-        return self._arrs[item] if item in self else super().__getattribute__(item)
+        return self._field(item) if item in self else super().__getattribute__(item)
 
     def __iter__(self):
         return iter(self._arrs.keys())
@@ -100,17 +310,17 @@ class StructuredArray(CoreType):
         if isinstance(other, StructuredArray):
             equ = self.shape == other.shape and \
                   set(self._arrs.keys()) == set(other._arrs.keys()) and \
-                  checkall(self._arrs.keys(), lambda k: np.all(self._arrs[k] == other._arrs[k]) if self._arrs[k].dtype.kind != 'f' else
+                  checkall(self._arrs.keys(), lambda k: np.all(self._values(k) == other._values(k)) if self._arrs[k].dtype.kind != 'f' else
                                                         np.allclose(self._arrs[k], other._arrs[k]))
         else:
-            equ = np.asarray(self.arrays, dtype = object) == np.asarray(other, dtype = object)
+            equ = np.asarray(smap(self._arrs.keys(), self._values), dtype = object) == np.asarray(other, dtype = object)
         return equ
 
     def __str__(self):
         if len(self._arrs) == 0: return '[ ]'
         nlen = max(smap(self._arrs.keys(), len))
         olns = [(('{'+f':{nlen}s'+'} : ').format(k) if i == 0 else (' ' * (nlen + 3))) + ln
-                for k,v in zip(self._arrs.keys(), smap(self._arrs.values(), str)) for i,ln in enumerate(v.split('\n'))]
+                for k,v in zip(self._arrs.keys(), smap(self._arrs.keys(), lambda x: str(self._values(x)))) for i,ln in enumerate(v.split('\n'))]
         return paste(olns, sep = '\n')
 
     def __repr__(self):
@@ -120,10 +330,35 @@ class StructuredArray(CoreType):
         return paste(rlns, sep = '\n') + f', size = ({self.size}, {self.length}))'
 
     # for numpy
+    def __getstate__(self):
+        fidx = {k: [v[0], None] for k,v in self._fidx.items()} # indexes are rebuilt after loading
+        if missing(self._blocks): return dict(super().__getstate__(), _shared = set(), _viewed = set(), _fidx = fidx)
+        # block fields are pickled once with their blocks, not again as views
+        bkeys = self._blockkeys()
+        return dict(super().__getstate__(), _shared = set(), _viewed = set(), _fidx = fidx,
+                    _arrs = OrderedDict([(k, None if k in bkeys else v) for k,v in self._arrs.items()]),
+                    _blocks = [[buf[:self._length], cols] for buf,cols in self._blocks])
+
+    def __setstate__(self, dct):
+        super().__setstate__(dict(dct, _blocks = dct.get('_blocks'), _cats = dct.get('_cats', {}), _fidx = dct.get('_fidx', {}), _shared = set(), _viewed = set())) # states pickled without blocks
+        for blk in optional(self._blocks, []): self._rebind(blk)
+
     def __array__(self, dtype = None):
-        if available(dtype): return np.asarray(self.arrays, dtype = dtype)
-        arr = np.array([*zip(*self._arrs.values())],
-                       dtype = [(n, v.dtype.str) for n,v in zip(self._arrs.keys(), self._arrs.values())])
+        if available(dtype): return np.asarray(smap(self._arrs.keys(), self._values), dtype = dtype)
+        dtype = [(n, self._values(n).dtype.str) for n in self._arrs.keys()]
+
+        # a single block in field order already has the record layout
+        if available(self._blocks) and len(self._blocks) == 1 and len(self._cats) == 0:
+            buf, cols = self._blocks[0]
+            buf = buf[:self._length]
+            if buf.dtype.kind != 'O' and buf.flags.c_contiguous and l(cols.items()) == l(zip(self._arrs.keys(), range(self.size))):
+                self._shared.update(cols.keys()) # later writes go to a copy of the block
+                arr = buf.view(dtype).reshape(self._length)
+                arr.flags.writeable = False
+                return arr
+
+        arr = np.empty(optional(self._length, 0), dtype = dtype)
+        for k in self._arrs.keys(): arr[k] = self._values(k)
         return arr
 
     def __array_wrap__(self, arr):
@@ -137,11 +372,19 @@ class StructuredArray(CoreType):
 
     @property
     def arrays(self) -> List[np.ndarray]:
-        return l(self._arrs.values())
+        return smap(self._arrs.keys(), self._field)
 
     @property
     def fields(self) -> List[Tuple[str, np.ndarray]]:
-        return l(self._arrs.items())
+        return [(k, self._field(k)) for k in self._arrs.keys()]
+
+    @property
+    def indexes(self) -> Dict[str, str]:
+        return {k: v[0] for k,v in self._fidx.items()}
+
+    @property
+    def categories(self) -> Dict[str, np.ndarray]:
+        return {k: v.copy() for k,v in self._cats.items()}
 
     @property
     def size(self) -> int:
@@ -161,9 +404,9 @@ class StructuredArray(CoreType):
 
     # publics
     def take(self, pos: Indices2D, axis: Optional[int] = 0) -> StructuredArray:
-        if isstring(pos): return self._arrs[pos]
+        if isstring(pos): return self._field(pos)
         sids, aids = self._parseids(pos, axis = axis)
-        return StructuredArray([(k, self._arrs[k][aids]) for k in sids])
+        return self._subset(sids, aids)
 
     def put(self, pos: Indices2D, value: Any, axis: Optional[int] = 0, inline: bool = False) -> StructuredArray:
         narr = self if inline else self.copy()
@@ -173,14 +416,20 @@ class StructuredArray(CoreType):
             if not isinstance(vals, np.ndarray): raise ValueError('input array not in 1-dimensional')
             if missing(narr._length): narr._length = vals.shape[0]
             elif narr._length != vals.shape[0]: raise ValueError('input array size not match')
+            narr._detach(pos)
+            narr._cats.pop(pos, None)
+            narr._touch([pos])
             narr._arrs[pos] = vals.copy()
+            narr._shared.discard(pos)
+            narr._viewed.discard(pos)
         else:
             sids, aids = self._parseids(pos, axis = axis)
-            if not isinstance(vals, list):
-                for k in sids: narr._arrs[k][aids] = vals
-            else:
-                if len(sids) != len(vals): raise ValueError('input names and values size not match')
-                for k,vals in zip(sids, vals): narr._arrs[k][aids] = vals
+            narr._unshare(sids)
+            narr._touch(sids)
+            if isinstance(vals, list) and len(sids) != len(vals): raise ValueError('input names and values size not match')
+            for k,v in zip(sids, vals if isinstance(vals, list) else [vals] * len(sids)):
+                if k in narr._cats: v = narr._catcodes(k, v)
+                narr._arrs[k][aids] = v
         return narr
 
     def append(self, value: Any, inline: bool = False) -> StructuredArray:
@@ -190,19 +439,28 @@ class StructuredArray(CoreType):
         narr = self if inline else self.copy()
         vals = self._parsevals(value)
 
-        _upd = (lambda x,y: np.insert(x, pos, y)) if available(pos) else (lambda x,y: np.hstack([x, y]))
-        if not isinstance(vals, list):
-            for k, v in narr._arrs.items(): narr._arrs[k] = _upd(v, vals)
-            narr._length += vals.shape[0] if isinstance(vals, np.ndarray) else 1
+        if isinstance(vals, list) and len(vals) != narr.size: raise ValueError('input values size not match')
+        fvals = OrderedDict(zip(narr._arrs.keys(), vals)) if isinstance(vals, list) else OrderedDict([(k, vals) for k in narr._arrs.keys()])
+        nlen = vals[0].shape[0] if isinstance(vals, list) else vals.shape[0] if isinstance(vals, np.ndarray) else 1
+        for k in fvals.keys():
+            if k in narr._cats: fvals[k] = narr._catcodes(k, fvals[k])
+
+        # appended values changing field dtypes cannot be written into blocks, np.insert always casts
+        if available(narr._blocks) and (available(pos) or
+                                        checkall(fvals.items(), unpack(lambda k,v: np.result_type(narr._arrs[k].dtype, np.asarray(v).dtype) == narr._arrs[k].dtype))):
+            narr._insertblocks(pos, fvals, nlen)
         else:
-            if len(vals) != narr.size: raise ValueError('input values size not match')
-            for (k,v), o in zip(narr._arrs.items(), vals): narr._arrs[k] = _upd(v, o)
-            narr._length += vals[0].shape[0]
+            _upd = (lambda x,y: np.insert(x, pos, y)) if available(pos) else (lambda x,y: np.hstack([x, y]))
+            for k,v in fvals.items(): narr._arrs[k] = _upd(narr._arrs[k], v)
+            narr._length += nlen
+            if available(narr._blocks): narr._blocks = None; narr.consolidate(inline = True)
+        narr._touch()
+        narr._shared.clear()
         return narr
 
     def delete(self, pos: Indices2D, axis: Optional[int] = 0, inline: bool = False) -> StructuredArray:
         narr = self if inline else self.copy()
-        if isstring(pos): del narr._arrs[pos]; return narr
+        if isstring(pos): narr._detach(pos); narr._cats.pop(pos, None); narr._fidx.pop(pos, None); del narr._arrs[pos]; narr._shared.discard(pos); return narr
 
         sids, aids = self._parseids(pos, axis = axis, mapslice = False)
         slic = isinstance(sids, slice) and sids == slice(None)
@@ -211,17 +469,105 @@ class StructuredArray(CoreType):
         if slic and alic:
             narr._arrs = OrderedDict()
             narr._length = None
+            narr._shared.clear()
+            if available(narr._blocks): narr._blocks = []
+            narr._cats, narr._fidx = {}, {}
         elif slic and not alic:
             if listable(aids) and len(aids) == 1 and aids[0] < 0: aids = aids[0] # fix the issue that currently negative indices are ignored by np.delete
-            for k,v in narr._arrs.items(): narr._arrs[k] = np.delete(v, aids)
-            narr._length = len(narr._arrs[l(narr._arrs.keys())[0]])
+            kids = np.delete(np.arange(narr._length), aids)
+            for blk in optional(narr._blocks, []): blk[0] = blk[0][kids]
+            bkeys = narr._blockkeys()
+            for k,v in narr._arrs.items():
+                if k not in bkeys: narr._arrs[k] = np.delete(v, aids)
+            narr._length = kids.shape[0]
+            for blk in optional(narr._blocks, []): narr._rebind(blk)
+            narr._touch()
+            narr._shared.clear()
         elif not slic and alic:
             if isinstance(sids, slice) or sids.dtype.kind not in ('S', 'U'): sids = narr.names[sids]
-            for k in sids: del narr._arrs[k]
+            for k in sids: narr._detach(k); narr._cats.pop(k, None); narr._fidx.pop(k, None); del narr._arrs[k]
+            narr._shared.difference_update(sids)
         else: raise IndexError('unable to delete portion of the array')
 
         return narr
 
+    def categorize(self, keys: Optional[Union[str, Iterable[str]]] = None, inline: bool = False) -> StructuredArray:
+        # dictionary encoding, string fields by default
+        narr = self if inline else self.copy()
+        keys = [keys] if isstring(keys) else optional(keys, [k for k,v in narr._arrs.items() if v.dtype.kind in ('U', 'S', 'O')])
+        for k in keys:
+            if k in narr._cats: continue
+            vals = narr._arrs[k]
+            codes, cats = pd.factorize(vals)
+            cats = np.asarray(cats)
+            if np.any(codes < 0): cats, codes = np.hstack([cats, vals[codes < 0][:1]]), np.where(codes < 0, cats.shape[0], codes) # missing values kept as the last category
+            narr._detach(k)
+            narr._arrs[k], narr._cats[k] = codes.astype(np.min_scalar_type(-max(cats.shape[0], 1))), cats.astype(vals.dtype)
+            narr._shared.discard(k)
+            narr._viewed.discard(k)
+        return narr
+
+    def isin(self, key: str, values: Any) -> np.ndarray:
+        if key not in self._cats: return np.isin(self._arrs[key], values)
+        return np.isin(self._arrs[key], np.where(np.isin(self._cats[key], values))[0]) # compared on codes
+
+    def createindex(self, key: str, kind: str = 'hash') -> None:
+        # hash indexes serve equality lookups, sorted indexes serve range lookups as well
+        if key not in self._arrs: raise KeyError(f'unknown field name {key}')
+        validarg(kind, ('hash', 'sorted'))
+        self._fidx[key] = [kind, None]
+
+    def dropindex(self, key: str) -> None:
+        if key not in self._fidx: raise KeyError(f'field {key} not indexed')
+        del self._fidx[key]
+
+    def lookup(self, key: str, values: Optional[Any] = None, *, lower: Optional[Any] = None, upper: Optional[Any] = None) -> np.ndarray:
+        # positions of the values, or of the values within [lower, upper) if no values given
+        if key not in self._arrs: raise KeyError(f'unknown field name {key}')
+        kind, eng = self._findex(key) if key in self._fidx else (None, None)
+
+        if available(values):
+            vals = np.unique(np.asarray(values))
+            if kind == 'hash':
+                ids = [eng[v] for v in vals if v in eng]
+            elif kind == 'sorted':
+                svals, ords = eng
+                ids = [ords[lo:hi] for lo,hi in zip(np.searchsorted(svals, vals, 'left'), np.searchsorted(svals, vals, 'right'))]
+            else:
+                ids = [np.where(np.isin(self._values(key), vals))[0]]
+        elif kind == 'sorted':
+            svals, ords = eng
+            ids = [ords[(0 if missing(lower) else np.searchsorted(svals, lower, 'left')):(svals.shape[0] if missing(upper) else np.searchsorted(svals, upper, 'left'))]]
+        else:
+            vals, mask = self._values(key), np.ones(self._length, dtype = bool)
+            if available(lower): mask &= vals >= lower
+            if available(upper): mask &= vals < upper
+            ids = [np.where(mask)[0]]
+        return np.sort(np.concatenate(ids)) if len(ids) > 0 else np.array([], dtype = int)
+
+    def query(self, expr: str) -> np.ndarray:
+        # positions matching a boolean expression over the fields, e.g. "batch in ('B1', 'B2') and depth > 1e6"
+        try: node = ast.parse(expr.strip(), mode = 'eval').body
+        except SyntaxError: raise ValueError(f'invalid query expression [{expr}]')
+        ids = self._qindex(node)
+        return ids if available(ids) else np.where(self._qmask(node))[0]
+
+    def consolidate(self, capacity: Optional[int] = None, inline: bool = False) -> StructuredArray:
+        # pack fields of the same dtype into one row-major block, fields become column views of the blocks
+        narr = self if inline else self.copy()
+        nlen = optional(narr._length, 0)
+
+        grps = OrderedDict()
+        for k,v in narr._arrs.items(): grps.setdefault(v.dtype.str, []).append(k)
+        narr._blocks = []
+        for dt,ks in grps.items():
+            buf = np.empty((max(optional(capacity, 0), nlen), len(ks)), dtype = dt)
+            for j,k in enumerate(ks): buf[:nlen,j] = narr._arrs[k]
+            narr._blocks.append([buf, {k: j for j,k in enumerate(ks)}])
+            narr._rebind(narr._blocks[-1])
+        narr._shared.clear()
+        return narr
+
     def tolist(self) -> List:
         return self.arrays
 
@@ -230,27 +576,25 @@ class StructuredArray(CoreType):
 
     def tomultindex(self) -> pd.MultiIndex:
         if self.size == 0: raise ValueError('unable to create MultiIndex from empty array')
-        return pd.MultiIndex.from_arrays(self.arrays, names = self.names.tolist())
+        return pd.MultiIndex.from_arrays(smap(self._arrs.keys(), self._values), names = self.names.tolist())
 
     def copy(self) -> StructuredArray:
-        narr = StructuredArray()
-        narr._arrs = OrderedDict([(k, v.copy()) for k,v in self._arrs.items()])
-        narr._length = self._length
-        return narr
+        return self._share(StructuredArray())
 
     # file portals
     @classmethod
     def fromsarray(cls, array: np.ndarray) -> StructuredArray:
-        _r = re.compile('<(.*)::([<>|]?[biufcmMOSUV]\\d*)>')
+        _r = re.compile('<(.*)::([<>|]?[biufcmMOSUV]\\d*)(::cat)?>')
         nams, vals = array[:,0], array[:,1:]
-        nams, vdts = np.vectorize(lambda x: (lambda v: v[0] if len(v) > 0 else '')(_r.findall(x)))(nams)
+        nams, vdts, cats = np.vectorize(lambda x: (lambda v: v[0] if len(v) > 0 else ('', '', ''))(_r.findall(x)))(nams)
         vals = smap(zip(vals,vdts), unpack(lambda v,d: np.asarray(v).astype(d) if d != '|b1' else v == 'True'))
-        return StructuredArray(zip(nams, vals))
+        return StructuredArray(zip(nams, vals)).categorize(nams[cats != ''], inline = True)
 
     def tosarray(self, withdtype: bool = True) -> np.ndarray:
+        _tag = lambda k,v: f'<{k}::{v.dtype.str}' + ('::cat>' if k in self._cats else '>')
         vals = np.array([
-            np.r_[[f'<{k}::{v.dtype.str}>' if withdtype else str(k)], v.astype(str)]
-            for k,v in self._arrs.items()
+            np.r_[[_tag(k, v) if withdtype else str(k)], v.astype(str)]
+            for k,v in zip(self._arrs.keys(), smap(self._arrs.keys(), self._values))
         ])
         return vals
 
@@ -266,18 +610,29 @@ class StructuredArray(CoreType):
         return tablePortal.save(odm, fname, delimiter = delimiter)
 
     @classmethod
-    def fromhtable(cls, hdftable: tb.Table) -> StructuredArray:
+    def fromhtable(cls, hdftable: tb.Table, ids: Optional[Union[slice, np.ndarray]] = None) -> StructuredArray:
         nams = hdftable.attrs.names
         knds = hdftable.attrs.kinds
-        vals = [np.array(hdftable.colinstances[n]).astype(t) for n,t in zip(nams,knds)]
-        return StructuredArray(zip(nams, vals))
+        ids = optional(ids, slice(None))
+        _read = (lambda n: hdftable.read(ids.start, ids.stop, ids.step, field = n)) if isinstance(ids, slice) else \
+                (lambda n: hdftable.read_coordinates(ids, field = n))
+        vals = [_read(n).astype(t) for n,t in zip(nams,knds)]
+        narr = StructuredArray(zip(nams, vals))
+        if hasattr(hdftable.attrs, 'categories'):
+            for k,c in hdftable.attrs.categories.items(): # stored as codes
+                narr._arrs[k], narr._cats[k] = narr._arrs[k].astype(np.min_scalar_type(-max(c.shape[0], 1))), c
+        return narr
 
-    def tohtable(self, root: tb.Group, tabname: str) -> tb.Table:
-        desc = type('_struct_array', (tb.IsDescription,), {n: tb.Col.from_dtype(v.dtype) for n,v in self._arrs.items()})
+    def tohtable(self, root: tb.Group, tabname: str, strwidth: Optional[int] = None) -> tb.Table:
+        # categorical codes are stored as int32 so that appended rows can add categories
+        _widen = lambda x: x.astype(np.promote_types(x.dtype, f'{x.dtype.kind}{strwidth}')) if available(strwidth) and x.dtype.kind in ('U', 'S') else x
+        arrs = OrderedDict([(k, v.astype(np.int32) if k in self._cats else _widen(v)) for k,v in self._arrs.items()])
+        desc = type('_struct_array', (tb.IsDescription,), {n: tb.Col.from_dtype(v.dtype) for n,v in arrs.items()})
         tabl = tb.Table(root, tabname, desc)
-        tabl.append([self._arrs[n] for n in tabl.colnames]) # desc.columns is an un-ordered dict
+        tabl.append([arrs[n] for n in tabl.colnames]) # desc.columns is an un-ordered dict
         tabl.attrs.names = self.names
-        tabl.attrs.kinds = [v.dtype.str for v in self.arrays]
+        tabl.attrs.kinds = [v.dtype.str for v in arrs.values()]
+        if len(self._cats) > 0: tabl.attrs.categories = self.categories
         return tabl
 
     @classmethod
@@ -12,13 +12,16 @@ added: 02-18-2017
 
 from __future__ import annotations
 
-import logging, os, re
+import logging, os, re, csv, pickle, json
 import numpy as np
 import tables as ptb
 import pandas as pd
-from typing import Iterable, Sequence, Mapping, Union, Optional, Any
+from typing import Iterable, Iterator, Sequence, Mapping, Union, Optional, Any
 from pathlib import Path
-from kagami.comm import ll, optional, missing, available, isstring, iterable, listable, checkany, paste, imap, smap, collapse, checkInputFile, checkOutputFile, Metadata
+from collections import OrderedDict
+from itertools import islice, chain
+from multiprocessing.shared_memory import SharedMemory
+from kagami.comm import l, ll, optional, missing, available, isstring, iterable, listable, checkany, paste, validarg, smap, collapse, checkInputFile, checkOutputFile, checkInputDir, checkOutputDir, Metadata
 from kagami.portals import tablePortal
 from .coreType import CoreType, Indices, Indices2D
 from .namedIndex import NamedIndex
@@ -28,25 +31,47 @@ try:
 except ImportError as e: rw = None
 
 
-__all__ = ['Table']
+__all__ = ['Table', 'TableBuilder']
 
 
 # table class
 _copy = lambda x: None if x is None else x.copy()
 
+_sidecar = lambda x: Path(str(x) + '.meta')
+
+_dtptn = re.compile('#<::([<>|]?[biufcmMOSUV]\\d*)::>')
+_findt = lambda x: (lambda v: v[0] if len(v) > 0 else '')(_dtptn.findall(x))
+
+class _SharedBuffer:
+    # array interface over a shared memory segment, arrays built on it keep the segment mapped until they are all released
+    __slots__ = ('__array_interface__', '_memory')
+
+    def __init__(self, memory, dtype, shape, offset):
+        self.__array_interface__ = np.ndarray(shape, dtype = dtype, buffer = memory.buf, offset = offset).__array_interface__
+        self._memory = memory
+
+class _TableViewer:
+    __slots__ = ('_table',)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, item):
+        return self._table.take(item, axis = None, view = True)
+
 class Table(CoreType):
-    __slots__ = ('_dmatx', '_rnames', '_cnames', '_rindex', '_cindex', '_metas', '_memmap')
+    __slots__ = ('_dmatx', '_rnames', '_cnames', '_rindex', '_cindex', '_metas', '_memmap', '_shmem', '_shared', '_viewed')
 
     def __init__(self, X: Iterable[Iterable], *, dtype: Optional[Union[str, type, np.ndarray.dtype]] = None,
                  rownames: Optional[Union[Iterable[str], NamedIndex]] = None, rowindex: Optional[Union[Iterable, Mapping, np.ndarray, StructuredArray]] = None,
                  colnames: Optional[Union[Iterable[str], NamedIndex]] = None, colindex: Optional[Union[Iterable, Mapping, np.ndarray, StructuredArray]] = None,
-                 metadata: Optional[Union[Sequence, Mapping]] = None, memmap: Optional[Union[str, Path]] = None):
+                 metadata: Optional[Union[Sequence, Mapping]] = None, memmap: Optional[Union[str, Path]] = None, copy: bool = True):
         if not isinstance(X, np.ndarray): X = smap(X, ll)
-        self._dmatx = np.array(X, dtype = dtype) # make a copy
+        self._dmatx = np.array(X, dtype = dtype, copy = copy) # make a copy by default
         if self._dmatx.ndim != 2: raise ValueError('input data is not a 2-dimensional matrix')
 
-        self._memmap = None
-        if available(memmap): self.offload(memmap)
+        self._shared = self._viewed = False
+        self._memmap = self._shmem = None
 
         self._rnames = self._cnames = None
         self.rows_ = rownames
@@ -57,6 +82,7 @@ class Table(CoreType):
         self.cidx_ = colindex
 
         self._metas = Metadata(optional(metadata, ()))
+        if available(memmap): self.offload(memmap)
 
     # privates
     @staticmethod
@@ -64,11 +90,61 @@ class Table(CoreType):
         if isinstance(ids, NamedIndex):
             ids = np.array(ids)
         else:
+            if isinstance(ids, np.ndarray) and ids.dtype.kind in ('b', 'i', 'u'): return ids # positions, no need to scan for names
             if not listable(ids): ids = [ids]
             if not checkany(ids, isstring): return ids
         if missing(names): raise KeyError('table names not set')
         return names.idsof(ids, safe = False)
 
+    def _unshare(self):
+        if not self._shared: return
+        self._dmatx, self._shared = np.array(self._dmatx), False
+
+    def _detach(self):
+        # data matrix reallocated, no longer aliased by views or backed by the offloaded file
+        self._shared = self._viewed = False
+        if missing(self._memmap): return
+        if self._memmap.get('mode') in ('w+', 'r+') and _sidecar(self._memmap.file).is_file():
+            with open(_sidecar(self._memmap.file), 'rb') as f: meta = pickle.load(f)
+            with open(_sidecar(self._memmap.file), 'wb') as f: pickle.dump(dict(meta, stale = True), f)
+        self._memmap = None
+
+    def _savemeta(self, create = False):
+        # names and indices are kept in a sidecar file, so that the matrix can be re-attached by openmemmap
+        if missing(self._memmap) or self._memmap.get('mode') not in ('w+', 'r+'): return # read-only / private mappings leave the files as they are
+        if not (create or _sidecar(self._memmap.file).is_file()): return
+        with open(_sidecar(self._memmap.file), 'wb') as f:
+            pickle.dump({'dtype': self.dtype.str, 'shape': self.shape, 'rownames': self._rnames, 'colnames': self._cnames,
+                         'rowindex': self._rindex, 'colindex': self._cindex, 'metadata': self._metas}, f)
+
+    def _derive(self, dmatx, rnames, cnames, rindex, cindex, share = False):
+        if share and (self._viewed or available(self._memmap) or available(self._shmem)):
+            dmatx, share = np.array(dmatx), False # buffer aliased by views / references or backed by file / shared memory, cannot defer the copy
+        if share: self._shared = True
+
+        ntab = Table.__new__(Table)
+        ntab._dmatx, ntab._memmap, ntab._shmem = dmatx, None, None
+        ntab._shared, ntab._viewed = share, False
+        ntab._rnames, ntab._cnames = rnames, cnames
+        ntab._rindex, ntab._cindex = rindex, cindex
+        ntab._metas = Metadata(self._metas)
+        return ntab
+
+    def _axisindex(self, axis):
+        if axis not in (0, 1): raise IndexError(f'unsupported axis [{axis}]')
+        idx = self._rindex if axis == 0 else self._cindex
+        if missing(idx): raise KeyError(f'table has no {"row" if axis == 0 else "column"} index')
+        return idx
+
+    def _parseviews(self, idx, axis = None):
+        rids, cids = self._parseids(idx, axis = axis, mapslice = False)
+
+        def _slice(ids):
+            if isinstance(ids, slice): return ids
+            if len(ids) != 1 or isinstance(ids[0], (bool, np.bool_)) or not isinstance(ids[0], (int, np.integer)): return None
+            return slice(int(ids[0]), int(ids[0]) + 1 or None)
+        return _slice(rids), _slice(cids)
+
     def _parseids(self, idx, axis = None, mapslice = True):
         if missing(axis):
             rids, cids = (idx, slice(None)) if not isinstance(idx, tuple) else \
@@ -98,12 +174,136 @@ class Table(CoreType):
         value = np.asarray(value if isinstance(value, np.ndarray) and value.ndim == 2 else smap(value, ll), dtype = self.dtype)
         return value
 
+    @staticmethod
+    def _parseheader(array, dtype = None, headerpos = None):
+        if missing(headerpos):
+            mtab = np.vectorize(_findt)(array[:100,:100])
+            dpos = np.c_[np.where(mtab != '')]
+            if dpos.shape[0] >= 2: raise ValueError('string array has multiple headers')
+            if dpos.shape[0] == 0: raise ValueError('string array has no header in the first 100 rows / cols')
+            headerpos = dpos[0]
+        rids, cids = headerpos
+
+        if missing(dtype):
+            dtype = _findt(array[rids,cids])
+            if dtype == '': raise ValueError('unknown array data type')
+        return rids, cids, dtype
+
+    @staticmethod
+    def _fromblocks(dmtx, dtype, rnam, cnam, ridx, cidx, copy = True):
+        ridx = StructuredArray.fromsarray(ridx) if available(ridx) else None
+        cidx = StructuredArray.fromsarray(cidx) if available(cidx) else None
+        if np.all(rnam == smap(range(rnam.shape[0]), lambda x: f'[{x}]')): rnam = None
+        if np.all(cnam == smap(range(cnam.shape[0]), lambda x: f'[{x}]')): cnam = None
+        return Table(dmtx, dtype = dtype, rownames = rnam, colnames = cnam, rowindex = ridx, colindex = cidx, copy = copy)
+
+    @classmethod
+    def _readcsv(cls, fname, delimiter = ',', dtype = None, headerpos = None, chunksize = None):
+        checkInputFile(fname)
+        with open(fname, 'r') as f: hdm = np.array(l(islice(csv.reader(f, delimiter = delimiter), 100 if missing(headerpos) else max(100, headerpos[0]+1))))
+        rids, cids, dtype = cls._parseheader(hdm, dtype, headerpos)
+        if hdm.shape[0] <= rids+1:
+            if missing(chunksize): yield cls.fromsarray(hdm, dtype = dtype, headerpos = (rids, cids))
+            return
+
+        ncol, dtype = hdm.shape[1], np.dtype(dtype)
+        ptype = dtype if dtype.kind in ('b', 'i', 'u', 'f') else None # other types converted by numpy as in fromsarray
+
+        cnam = hdm[rids,cids+1:]
+        cnam = None if np.all(cnam == smap(range(cnam.shape[0]), lambda x: f'[{x}]')) else NamedIndex(cnam)
+        cidx = StructuredArray.fromsarray(hdm[:rids,cids:]) if rids > 0 else None
+
+        # parse the data body straight into typed arrays, only names and indices are kept as strings
+        rpos = 0
+        with pd.read_csv(fname, sep = delimiter, header = None, skiprows = rids+1, keep_default_na = False, float_precision = 'round_trip',
+                         dtype = {i: object if i <= cids or missing(ptype) else ptype for i in range(ncol)},
+                         na_values = {i: ['nan'] if i > cids and dtype.kind == 'f' else [] for i in range(ncol)},
+                         iterator = True, chunksize = chunksize) as reader:
+            for body in reader:
+                smtx = body.iloc[:,:cids+1].to_numpy(dtype = str)
+                dmtx = np.ascontiguousarray(body.iloc[:,cids+1:].to_numpy(dtype = optional(ptype, str)))
+                rnam = smtx[:,cids]
+                if np.all(rnam == smap(range(rpos, rpos+rnam.shape[0]), lambda x: f'[{x}]')): rnam = None
+                ridx = StructuredArray.fromsarray(np.vstack([hdm[rids,:cids], smtx[:,:cids]]).T) if cids > 0 else None
+                rpos += dmtx.shape[0]
+                yield Table(dmtx, dtype = dtype, rownames = rnam, colnames = cnam, rowindex = ridx, colindex = cidx, copy = False)
+
+    @staticmethod
+    def _hdfids(sel, size, names):
+        if missing(sel): return slice(None)
+        if isinstance(sel, slice): return sel
+
+        sel = np.atleast_1d(sel)
+        if sel.shape[0] == 0: return slice(0, 0) # empty point selection is not allowed in pytables
+        if sel.dtype.kind == 'b':
+            if sel.shape[0] != size: raise IndexError('boolean selector size not match')
+            sel = np.where(sel)[0]
+        elif sel.dtype.kind in ('U', 'S'):
+            if missing(names): raise KeyError('table names not set')
+            sel = np.array(NamedIndex(Table._hdfdecode(names.read())).idsof(sel.astype(str)))
+        else: sel = np.arange(size)[sel]
+        return sel
+
+    @staticmethod
+    def _hdfencode(arr, width = None, minwidth = None):
+        if arr.dtype.kind not in ('U', 'S'): return arr
+        if arr.dtype.kind == 'U': arr = np.char.encode(arr, 'utf-8')
+        if available(width) and arr.dtype.itemsize > width: raise ValueError('string values exceed the width stored in hdf file')
+        if available(minwidth) and arr.dtype.itemsize < minwidth: arr = arr.astype(f'S{minwidth}') # room for longer values appended later
+        return arr
+
+    @staticmethod
+    def _hdfdecode(arr):
+        return np.char.decode(arr, 'utf-8') if arr.dtype.kind == 'S' else np.array(arr, dtype = str)
+
+    @staticmethod
+    def _readhdf(hdf, rids = slice(None), cids = slice(None), colnames = None, colindex = None):
+        # hyperslab reads, pytables allows point selection on one axis only
+        if isinstance(rids, slice) or isinstance(cids, slice): darr = hdf.root.DataMatx[rids,cids]
+        else: darr = hdf.root.DataMatx[rids,np.min(cids):np.max(cids)+1][:,cids-np.min(cids)]
+        if darr.dtype.kind == 'S': darr = Table._hdfdecode(darr)
+        meta = [(n, getattr(hdf.root.DataMatx.attrs, n)) for n in hdf.root.DataMatx.attrs._f_list('user')]
+
+        rnam = Table._hdfdecode(hdf.root.RowNames[rids]) if hasattr(hdf.root, 'RowNames') else None
+        cnam = optional(colnames, np.array(hdf.root.ColNames[cids], dtype = str) if hasattr(hdf.root, 'ColNames') else None)
+        ridx = StructuredArray.fromhtable(hdf.root.RowIndex, rids) if hasattr(hdf.root, 'RowIndex') else None
+        cidx = optional(colindex, StructuredArray.fromhtable(hdf.root.ColIndex, cids) if hasattr(hdf.root, 'ColIndex') else None)
+        return Table(darr, rownames = rnam, colnames = cnam, rowindex = ridx, colindex = cidx, metadata = meta, copy = False)
+
+    def _tostrblocks(self, withindex = True, withdtype = True, chunksize = None, precision = None):
+        ridx = self._rindex if withindex else None
+        cidx = self._cindex if withindex else None
+
+        cnam = np.asarray(self._cnames) if available(self._cnames) else np.array(smap(range(self.ncol), lambda x: f'[{x}]'))
+        hmtx = np.hstack([f'#<::{self.dtype.str}::>' if withdtype else '#', cnam]).reshape((1,-1))
+        if available(ridx): hmtx = np.hstack([ridx[:,:0].tosarray(withdtype = withdtype).T, hmtx])
+        if available(cidx):
+            cmtx = cidx.tosarray(withdtype = withdtype)
+            if available(ridx): cmtx = np.hstack([np.tile([''], (cidx.size, ridx.size)), cmtx])
+            hmtx = np.vstack([cmtx, hmtx])
+        yield hmtx
+
+        # format one block of rows at a time, memory is bounded by the chunk size
+        _fmt = (lambda x: np.char.mod(f'%.{precision}g', x)) if available(precision) and self.dtype.kind == 'f' else (lambda x: x.astype(str))
+        for i in range(0, self.nrow, optional(chunksize, max(self.nrow, 1))):
+            ids = slice(i, i + chunksize) if available(chunksize) else slice(None)
+            rnam = self._rnames.namesof(ids).astype(str) if available(self._rnames) else np.array(smap(range(self.nrow)[ids], lambda x: f'[{x}]'))
+            smtx = np.hstack([rnam.reshape((-1,1)), _fmt(self._dmatx[ids])])
+            if available(ridx): smtx = np.hstack([ridx[:,ids].tosarray(withdtype = withdtype)[:,1:].T, smtx])
+            yield smtx
+
     def _tostrlns(self, delimiter, *, transpose = False, withindex = True, strinkrows = 15, strinkcols = 10):
         def _fmt(mtx, rnam, cnam, ridx, cidx):
             nr, nc = mtx.shape
 
-            if missing(rnam): rnam = smap(range(nr), lambda x: f'[{x}]')
-            if missing(cnam): cnam = smap(range(nc), lambda x: f'[{x}]')
+            # slice out the displayed rows / columns only, formatting cost does not depend on table size
+            rids = np.r_[:5, nr-3:nr] if nr > strinkrows else np.arange(nr)
+            cids = np.r_[:3, nc-1:nc] if nc > strinkcols else np.arange(nc)
+            mtx = mtx[np.ix_(rids, cids)]
+            rnam = smap(rids, lambda x: f'[{x}]') if missing(rnam) else rnam.namesof(rids)
+            cnam = smap(cids, lambda x: f'[{x}]') if missing(cnam) else cnam.namesof(cids)
+            if available(ridx): ridx = ridx[:,rids]
+            if available(cidx): cidx = cidx[:,cids]
 
             _sln  = lambda x,sr,hd,tl,rp: (smap(x[:hd],str) + [rp] + smap(x[tl:],str)) if sr else smap(x, str)
             _scol = lambda x: _sln(x, nc > strinkcols, 3, -1, ' ... ')
@@ -111,7 +311,7 @@ class Table(CoreType):
 
             slns = [_scol(cnam)] + \
                   ([_scol(ln) for ln in mtx] if nr <= strinkrows else
-                  ([_scol(ln) for ln in mtx[:5]] + [_scol([' ... ... '] + [''] * (nc-1))] + [_scol(ln) for ln in mtx[-3:]]))
+                  ([_scol(ln) for ln in mtx[:5]] + [_scol([' ... ... '] + [''] * (cids.shape[0]-1))] + [_scol(ln) for ln in mtx[-3:]]))
             slns = [['#'] + slns[0]] + [[n] + ln for n,ln in zip(_srow(rnam), slns[1:])]
 
             nri = ridx.size if available(ridx) else 0
@@ -148,7 +348,7 @@ class Table(CoreType):
         self.delete(key, axis = None, inline = True)
 
     def __iter__(self):
-        return imap(self._dmatx, np.array)
+        return self.iterrows()
 
     def __contains__(self, item):
         return item in self._dmatx
@@ -189,8 +389,19 @@ class Table(CoreType):
         return paste(rlns, sep = '\n') + f'], size = ({self.nrow}, {self.ncol}))'
 
     # for numpy
+    def __getstate__(self):
+        # memmap / shared memory attachments are not transferred, the matrix is sent as a plain array
+        return dict(super().__getstate__(), _dmatx = np.asarray(self._dmatx).view(np.ndarray), _memmap = None, _shmem = None, _shared = False, _viewed = False)
+
+    def __setstate__(self, dct):
+        super().__setstate__(dict(dict(_memmap = None, _shmem = None, _shared = False, _viewed = False), **dct)) # states pickled before these slots existed
+
     def __array__(self, dtype = None):
-        return np.asarray(self._dmatx, dtype = dtype)
+        arr = np.asarray(self._dmatx, dtype = dtype)
+        if not np.may_share_memory(arr, self._dmatx): return arr
+        if self._shared: arr = arr.view(); arr.flags.writeable = False
+        else: self._viewed = True # buffer handed out, later copies cannot share it
+        return arr
 
     def __array_wrap__(self, arr):
         return Table(arr)
@@ -202,10 +413,13 @@ class Table(CoreType):
 
     @property
     def X_(self):
+        self._unshare()
+        self._viewed = True # buffer handed out, later copies cannot share it
         return self._dmatx
 
     @X_.setter
     def X_(self, value):
+        self._unshare()
         self._dmatx[:] = value
 
     @property
@@ -218,9 +432,10 @@ class Table(CoreType):
 
     @rows_.setter
     def rows_(self, value):
-        if missing(value): self._rnames = None; return
+        if missing(value): self._rnames = None; self._savemeta(); return
         self._rnames = NamedIndex(value)
         if self._rnames.size != self.nrow: raise ValueError('input row names size not match')
+        self._savemeta()
 
     @property
     def colnames(self):
@@ -232,9 +447,10 @@ class Table(CoreType):
 
     @cols_.setter
     def cols_(self, value):
-        if missing(value): self._cnames = None; return
+        if missing(value): self._cnames = None; self._savemeta(); return
         self._cnames = NamedIndex(value)
         if self._cnames.size != self.ncol: raise ValueError('input column names size not match')
+        self._savemeta()
 
     @property
     def rowindex(self):
@@ -246,9 +462,10 @@ class Table(CoreType):
 
     @ridx_.setter
     def ridx_(self, value):
-        if missing(value): self._rindex = None; return
+        if missing(value): self._rindex = None; self._savemeta(); return
         self._rindex = StructuredArray(value)
         if self._rindex.size != 0 and self._rindex.length != self.nrow: raise ValueError('input row index size not match')
+        self._savemeta()
 
     @property
     def colindex(self):
@@ -260,9 +477,10 @@ class Table(CoreType):
 
     @cidx_.setter
     def cidx_(self, value):
-        if missing(value): self._cindex = None; return
+        if missing(value): self._cindex = None; self._savemeta(); return
         self._cindex = StructuredArray(value)
         if self._cindex.size != 0 and self._cindex.length != self.ncol: raise ValueError('input column index size not match')
+        self._savemeta()
 
     @property
     def dtype(self):
@@ -271,6 +489,7 @@ class Table(CoreType):
     @dtype.setter
     def dtype(self, value):
         self._dmatx = self._dmatx.astype(value)
+        self._detach()
 
     @property
     def metadata(self):
@@ -278,10 +497,7 @@ class Table(CoreType):
 
     @property
     def T(self):
-        tab = Table(self._dmatx.T, metadata = self._metas)
-        tab._rnames, tab._cnames = _copy(self._cnames), _copy(self._rnames)
-        tab._rindex, tab._cindex = _copy(self._cindex), _copy(self._rindex)
-        return tab
+        return self._derive(self._dmatx.T, _copy(self._cnames), _copy(self._rnames), _copy(self._cindex), _copy(self._rindex), share = True)
 
     @property
     def size(self):
@@ -307,22 +523,50 @@ class Table(CoreType):
     def df(self):
         return self.todataframe(multidx = False)
 
+    @property
+    def view_(self):
+        return _TableViewer(self)
+
      # publics
-    def take(self, pos: Indices2D, axis: Optional[int] = 0) -> Table:
+    def take(self, pos: Indices2D, axis: Optional[int] = 0, view: bool = False) -> Table:
+        if view:
+            rids, cids = self._parseviews(pos, axis = axis)
+            if available(rids) and available(cids): # basic slicing only, fancy indexing falls back to copy
+                self._unshare()
+                self._viewed = True
+                ntab = self._derive(
+                    self._dmatx[rids, cids],
+                    self._rnames[rids] if available(self._rnames) else None,
+                    self._cnames[cids] if available(self._cnames) else None,
+                    self._rindex[:,rids] if available(self._rindex) else None,
+                    self._cindex[:,cids] if available(self._cindex) else None,
+                )
+                ntab._viewed = True
+                return ntab
+
         rids, cids = self._parseids(pos, axis = axis)
-        ntab = Table(
-            self._dmatx[np.ix_(rids, cids)], dtype = self.dtype,
-            rownames = self._rnames[rids] if available(self._rnames) else None,
-            colnames = self._cnames[cids] if available(self._cnames) else None,
-            rowindex = self._rindex[:,rids] if available(self._rindex) else None,
-            colindex = self._cindex[:,cids] if available(self._cindex) else None,
-            metadata = self._metas,
+        ntab = self._derive(
+            self._dmatx[np.ix_(rids, cids)],
+            self._rnames[rids] if available(self._rnames) else None,
+            self._cnames[cids] if available(self._cnames) else None,
+            self._rindex[:,rids] if available(self._rindex) else None,
+            self._cindex[:,cids] if available(self._cindex) else None,
         )
         return ntab
 
+    def select(self, key: str, values: Optional[Any] = None, *, lower: Optional[Any] = None, upper: Optional[Any] = None, axis: int = 0) -> Table:
+        # rows / columns by index field values, served by the field indexes if declared
+        return self.take(self._axisindex(axis).lookup(key, values, lower = lower, upper = upper), axis = axis)
+
+    def query(self, expr: str, axis: int = 0, view: bool = False) -> Table:
+        ids = self._axisindex(axis).query(expr)
+        if view and ids.shape[0] > 0 and ids[-1] - ids[0] + 1 == ids.shape[0]: ids = slice(int(ids[0]), int(ids[-1]) + 1) # contiguous matches can be viewed
+        return self.take(ids, axis = axis, view = view)
+
     def put(self, pos: Indices2D, value: Any, axis: Optional[int] = 0, inline: bool = False) -> Table:
         ntab = self if inline else self.copy()
         vals = self._parsevals(value)
+        ntab._unshare()
 
         if isinstance(pos, np.ndarray) and pos.shape == ntab.shape and pos.dtype.kind == 'b':
             ntab._dmatx[pos] = vals # for e.g. tab[tab == 0] = 1
@@ -334,8 +578,20 @@ class Table(CoreType):
                 if available(ntab._cnames): ntab._cnames[cids] = value._cnames
                 if available(ntab._rindex): ntab._rindex[:,rids] = value._rindex
                 if available(ntab._cindex): ntab._cindex[:,cids] = value._cindex
+                ntab._savemeta()
         return ntab
 
+    def iterrows(self, withnames: bool = False, chunksize: Optional[int] = None) -> Iterator:
+        # lazy read-only views, rows are neither copied nor writable through the iterator
+        dmtx = self._dmatx.view()
+        dmtx.flags.writeable = False
+        _name = (lambda x: self._rnames.namesof(x)) if available(self._rnames) else \
+                (lambda x: f'[{x}]' if isinstance(x, int) else np.array(smap(range(self.nrow)[x], lambda v: f'[{v}]')))
+
+        if missing(chunksize): return ((_name(i), r) for i,r in enumerate(dmtx)) if withnames else iter(dmtx)
+        blks = (slice(i, i + chunksize) for i in range(0, self.nrow, chunksize))
+        return ((_name(b), dmtx[b]) for b in blks) if withnames else (dmtx[b] for b in blks)
+
     def append(self, value: Table, axis: int = 0, inline: bool = False) -> Table:
         return self.insert(None, value = value, axis = axis, inline = inline)
 
@@ -363,8 +619,48 @@ class Table(CoreType):
             if available(ntab._cindex): ntab._cindex.insert(pos, value._cindex, inline = True)
         else: raise IndexError(f'unsupported axis [{axis}]')
 
+        ntab._detach()
         return ntab
 
+    @classmethod
+    def concat(cls, tables: Iterable[Table], axis: int = 0) -> Table:
+        tables = l(tables)
+        if len(tables) == 0: raise ValueError('no tables to concatenate')
+        if checkany(tables, lambda x: not isinstance(x, Table)): raise TypeError('unknown input data type')
+        if axis not in (0, 1): raise IndexError(f'unsupported axis [{axis}]')
+
+        # names and index along the fixed axis are checked once against the first table
+        ftab = tables[0]
+        fnam, fidx, cnam, cidx, fwd, cwd = ('_cnames', '_cindex', '_rnames', '_rindex', 'column', 'row') if axis == 0 else \
+                                           ('_rnames', '_rindex', '_cnames', '_cindex', 'row', 'column')
+        for tab in tables[1:]:
+            if tab.shape[1-axis] != ftab.shape[1-axis]: raise IndexError(f'input table has different number of {fwd}s')
+            if available(getattr(ftab, fnam)) and available(getattr(tab, fnam)) and np.any(getattr(tab, fnam) != getattr(ftab, fnam)):
+                raise IndexError(f'input table has different {fwd} names')
+            if available(getattr(ftab, fidx)) and available(getattr(tab, fidx)) and getattr(tab, fidx) != getattr(ftab, fidx):
+                raise IndexError(f'input table has different {fwd} index')
+            if available(getattr(ftab, cnam)) and missing(getattr(tab, cnam)): raise IndexError(f'input table has different {cwd} names')
+            if available(getattr(ftab, cidx)) and (missing(getattr(tab, cidx)) or set(getattr(tab, cidx).names) != set(getattr(ftab, cidx).names)):
+                raise IndexError(f'input table has different {cwd} index')
+
+        # single allocation, filled block by block
+        size = sum([tab.shape[axis] for tab in tables])
+        dmtx = np.empty((size, ftab.ncol) if axis == 0 else (ftab.nrow, size), dtype = ftab.dtype)
+        pos = 0
+        for tab in tables:
+            if axis == 0: dmtx[pos:pos+tab.nrow] = tab._dmatx
+            else: dmtx[:,pos:pos+tab.ncol] = tab._dmatx
+            pos += tab.shape[axis]
+
+        nams = np.concatenate([np.asarray(getattr(tab, cnam)) for tab in tables]) if available(getattr(ftab, cnam)) else None
+        idxs = [(k, np.concatenate([getattr(tab, cidx)[k] for tab in tables])) for k in getattr(ftab, cidx).names] if available(getattr(ftab, cidx)) else None
+        return Table(
+            dmtx, copy = False,
+            rownames = nams if axis == 0 else ftab._rnames, rowindex = idxs if axis == 0 else ftab._rindex,
+            colnames = nams if axis == 1 else ftab._cnames, colindex = idxs if axis == 1 else ftab._cindex,
+            metadata = ftab._metas,
+        )
+
     def delete(self, pos: Indices2D, axis: Optional[int] = 0, inline: bool = False) -> Table:
         ntab = self if inline else self.copy()
 
@@ -390,6 +686,7 @@ class Table(CoreType):
             if available(ntab._rindex): ntab._rindex.delete(rids, axis = 1, inline = True)
         else: raise IndexError('unable to delete portion of the table')
 
+        ntab._detach()
         return ntab
 
     def tolist(self) -> Any:
@@ -418,127 +715,293 @@ class Table(CoreType):
         return self.astype()
 
     def astype(self, dtype: Optional[Union[str, np.dtype, type]] = None) -> Table:
-        ntab = Table(self._dmatx, dtype = optional(dtype, self.dtype), metadata = self._metas)
-        ntab._rnames, ntab._cnames = _copy(self._rnames), _copy(self._cnames)
-        ntab._rindex, ntab._cindex = _copy(self._rindex), _copy(self._cindex)
-        return ntab
+        share = missing(dtype) or np.dtype(dtype) == self.dtype # same dtype -> copy-on-write
+        return self._derive(self._dmatx if share else np.array(self._dmatx, dtype = dtype),
+                            _copy(self._rnames), _copy(self._cnames), _copy(self._rindex), _copy(self._cindex), share = share)
 
     # memory offload
     def onload(self, removefile: bool = False) -> Table:
-        if not isinstance(self._dmatx, np.memmap): logging.warning('Table not offloaded, skip'); return self
+        if missing(self._memmap): logging.warning('Table not offloaded, skip'); return self
 
         checkInputFile(self._memmap.file)
         mdmatx = np.memmap(self._memmap.file, dtype = self._memmap.dtype, mode = 'r', shape = self._memmap.shape)
         self._dmatx = np.array(mdmatx)
+        self._shared = self._viewed = False
         del mdmatx
 
-        if removefile: self._memmap.file.unlink()
+        if removefile:
+            self._memmap.file.unlink()
+            if _sidecar(self._memmap.file).is_file(): _sidecar(self._memmap.file).unlink()
         self._memmap = None
         return self
 
     def offload(self, fname: Union[str, Path]) -> Table:
-        if isinstance(self._dmatx, np.memmap): logging.warning('Table already offloaded, skip'); return self
+        if available(self._memmap): logging.warning('Table already offloaded, skip'); return self
 
         checkOutputFile(fname)
         mdmatx = np.memmap(fname, dtype = self.dtype, mode = 'w+', shape = self.shape)
         mdmatx[:] = self._dmatx
         self._dmatx = mdmatx
+        self._shared = self._viewed = False
 
-        self._memmap = Metadata(file = Path(fname), dtype = self.dtype, shape = self.shape)
+        self._memmap = Metadata(file = Path(fname), dtype = self.dtype, shape = self.shape, mode = 'w+')
+        self._savemeta(create = True)
         return self
 
-    # portals
     @classmethod
-    def fromsarray(cls, array: np.ndarray, dtype: Optional[Union[str, type, np.ndarray.dtype]] = None, headerpos: Optional[Union[Sequence[int], np.ndarray]] = None) -> Table:
-        _r = re.compile('#<::([<>|]?[biufcmMOSUV]\\d*)::>')
-        _findt = lambda x: (lambda v: v[0] if len(v) > 0 else '')(_r.findall(x))
+    def openmemmap(cls, fname: Union[str, Path], mode: str = 'r') -> Table:
+        validarg(mode, ('r', 'r+', 'c'))
+        if Path(fname).is_dir(): return cls.load(fname, mode = mode)
+        checkInputFile(fname)
+        if ptb.is_hdf5_file(fname): raise ValueError('hdf file cannot be memory mapped, use HDFTable for lazy reads')
 
-        if missing(headerpos):
-            mtab = np.vectorize(_findt)(array[:100,:100])
-            dpos = np.c_[np.where(mtab != '')]
-            if dpos.shape[0] >= 2: raise ValueError('string array has multiple headers')
-            if dpos.shape[0] == 0: raise ValueError('string array has no header in the first 100 rows / cols')
-            headerpos = dpos[0]
-        rids, cids = headerpos
+        checkInputFile(_sidecar(fname))
+        with open(_sidecar(fname), 'rb') as f: meta = pickle.load(f)
+        if meta.get('stale', False): logging.warning(f'table offloaded to [{fname}] was reallocated afterwards, file is out of date')
+        mdmatx = np.memmap(fname, dtype = meta['dtype'], mode = mode, shape = meta['shape'])
 
-        if missing(dtype):
-            dtype = _findt(array[rids,cids])
-            if dtype == '': raise ValueError('unknown array data type')
+        ntab = Table(mdmatx, copy = False, rownames = meta['rownames'], colnames = meta['colnames'],
+                     rowindex = meta['rowindex'], colindex = meta['colindex'], metadata = meta['metadata'])
+        ntab._dmatx = mdmatx
+        ntab._memmap = Metadata(file = Path(fname), dtype = mdmatx.dtype, shape = mdmatx.shape, mode = mode)
+        return ntab
 
-        ridx = StructuredArray.fromsarray(array[rids:,:cids].T) if cids > 0 else None
-        cidx = StructuredArray.fromsarray(array[:rids,cids:])   if rids > 0 else None
+    def toshared(self, withindex: bool = True) -> Metadata:
+        if available(self._shmem): return self._shmem.handle
+        if self.dtype.kind == 'O': raise TypeError('object arrays not supported in shared memory')
+
+        # data matrix and numeric index fields are put in one segment, only the small handle crosses process boundaries
+        arrs = [('X', self._dmatx)]
+        if withindex:
+            for nm,idx in (('ridx', self._rindex), ('cidx', self._cindex)):
+                if available(idx): arrs += [(f'{nm}:{k}', idx[k]) for k in idx.names if idx[k].dtype.kind in ('b', 'i', 'u', 'f')]
+        offs = np.cumsum([0] + [(a.nbytes + 63) // 64 * 64 for _,a in arrs]) # 64 bytes aligned
+        shm = SharedMemory(create = True, size = max(int(offs[-1]), 1))
+        for (_,a),o in zip(arrs, offs): np.ndarray(a.shape, dtype = a.dtype, buffer = shm.buf, offset = int(o))[...] = a
+
+        lays = {k: (a.dtype.str, a.shape, int(o)) for (k,a),o in zip(arrs, offs)}
+        _index = lambda nm,idx: None if missing(idx) else [(k, None if f'{nm}:{k}' in lays else idx[k]) for k in idx.names]
+        handle = Metadata(name = shm.name, layout = lays, rownames = self._rnames, colnames = self._cnames,
+                          rowindex = _index('ridx', self._rindex), colindex = _index('cidx', self._cindex), metadata = self._metas)
+
+        # rebind to the segment, no private copy is kept
+        ntab = Table.fromshared(handle, memory = shm)
+        self._dmatx, self._rindex, self._cindex = ntab._dmatx, ntab._rindex, ntab._cindex
+        self._shared = self._viewed = False
+        self._shmem = Metadata(memory = shm, handle = handle, owner = True)
+        return handle
 
-        rnam = array[rids+1:,cids]
-        if np.all(rnam == smap(range(rnam.shape[0]), lambda x: f'[{x}]')): rnam = None
-        cnam = array[rids,cids+1:]
-        if np.all(cnam == smap(range(cnam.shape[0]), lambda x: f'[{x}]')): cnam = None
+    @classmethod
+    def fromshared(cls, handle: Metadata, *, memory: Optional[SharedMemory] = None) -> Table:
+        shm = memory if available(memory) else SharedMemory(name = handle.name)
+        _view = lambda k: (lambda t,s,o: np.asarray(_SharedBuffer(shm, t, s, o)))(*handle.layout[k])
+
+        def _index(nm, idx):
+            if missing(idx): return None
+            sarr = StructuredArray()
+            for k,v in idx: sarr._bind(k, _view(f'{nm}:{k}') if missing(v) else v)
+            return sarr
+
+        ntab = Table(_view('X'), copy = False, rownames = handle.rownames, colnames = handle.colnames,
+                     rowindex = _index('ridx', handle.rowindex), colindex = _index('cidx', handle.colindex), metadata = handle.metadata)
+        ntab._shmem = Metadata(memory = shm, handle = handle, owner = False)
+        return ntab
 
-        dmtx = array[rids+1:,cids+1:]
-        return Table(dmtx, dtype = dtype, rownames = rnam, colnames = cnam, rowindex = ridx, colindex = cidx)
+    def releaseshared(self) -> Table:
+        if missing(self._shmem): logging.warning('Table not shared, skip'); return self
 
-    def tosarray(self, withindex: bool = True, withdtype: bool = True) -> np.ndarray:
-        rnam = np.asarray(self._rnames) if available(self._rnames) else np.array(smap(range(self.nrow), lambda x: f'[{x}]'))
-        cnam = np.asarray(self._cnames) if available(self._cnames) else np.array(smap(range(self.ncol), lambda x: f'[{x}]'))
-        smtx = np.vstack([
-            np.hstack([f'#<::{self.dtype.str}::>' if withdtype else '#', cnam]),
-            np.hstack([rnam.reshape((-1,1)), np.asarray(self._dmatx, dtype = str)])
-        ])
-        if not withindex: return smtx
+        self._dmatx = np.array(self._dmatx)
+        for idx in (self._rindex, self._cindex):
+            if available(idx): idx._unshare()
+        shm, owner = self._shmem.memory, self._shmem.owner
+        self._shmem = None
 
-        if available(self._rindex):
-            ridx = self._rindex.tosarray(withdtype = withdtype)
-            smtx = np.hstack([ridx.T, smtx])
-        if available(self._cindex):
-            cidx = self._cindex.tosarray(withdtype = withdtype)
-            if available(self._rindex): cidx = np.hstack([np.tile([''], (self._cindex.size, self._rindex.size)), cidx])
-            smtx = np.vstack([cidx, smtx])
-        return smtx
+        # the mapping is closed when the last view into it is released, only the name is removed here
+        if owner: shm.unlink()
+        return self
+
+    # portals
+    @classmethod
+    def fromsarray(cls, array: np.ndarray, dtype: Optional[Union[str, type, np.ndarray.dtype]] = None, headerpos: Optional[Union[Sequence[int], np.ndarray]] = None) -> Table:
+        rids, cids, dtype = cls._parseheader(array, dtype, headerpos)
+        return cls._fromblocks(
+            array[rids+1:,cids+1:], dtype,
+            array[rids+1:,cids], array[rids,cids+1:],
+            array[rids:,:cids].T if cids > 0 else None,
+            array[:rids,cids:]   if rids > 0 else None,
+        )
+
+    def tosarray(self, withindex: bool = True, withdtype: bool = True) -> np.ndarray:
+        return np.vstack(l(self._tostrblocks(withindex, withdtype)))
 
     @classmethod
     def loadcsv(cls,  fname: Union[str, Path], *, delimiter: str = ',', transposed: bool = False,
-                dtype: Optional[Union[str, type, np.ndarray.dtype]] = None, headerpos: Optional[Union[Sequence[int], np.ndarray]] = None) -> Table:
+                dtype: Optional[Union[str, type, np.ndarray.dtype]] = None, headerpos: Optional[Union[Sequence[int], np.ndarray]] = None,
+                engine: str = 'c') -> Table:
+        if validarg(engine, ('c', 'python')) == 'c' and not transposed: return l(cls._readcsv(fname, delimiter, dtype, headerpos))[0]
+
         idm = np.array(tablePortal.load(fname, delimiter = delimiter))
         if transposed: idm = idm.T
         return cls.fromsarray(idm, dtype = dtype, headerpos = headerpos)
 
-    def savecsv(self, fname: Union[str, Path], *, delimiter: str = ',', transpose: bool = False, withindex: bool = True) -> bool:
-        odm = self.tosarray(withindex = withindex)
-        if transpose: odm = odm.T
-        tablePortal.save(odm, fname, delimiter = delimiter)
-        return os.path.isfile(fname)
+    def savecsv(self, fname: Union[str, Path], *, delimiter: str = ',', transpose: bool = False, withindex: bool = True,
+                chunksize: int = 10000, precision: Optional[int] = None) -> bool:
+        if transpose: return self.T.savecsv(fname, delimiter = delimiter, withindex = withindex, chunksize = chunksize, precision = precision)
+        return tablePortal.save(chain.from_iterable(self._tostrblocks(withindex, chunksize = chunksize, precision = precision)), fname, delimiter = delimiter)
 
     @classmethod
-    def loadhdf(cls, fname: Union[str, Path]) -> Table:
+    def loadhdf(cls, fname: Union[str, Path], rows: Optional[Union[slice, Iterable[Union[int, bool, str]]]] = None,
+                cols: Optional[Union[slice, Iterable[Union[int, bool, str]]]] = None) -> Table:
         checkInputFile(fname)
-        hdf = ptb.open_file(fname, mode = 'r')
-
-        darr = hdf.root.DataMatx.read()
-        if darr.dtype.kind == 'S': darr = np.array(darr, dtype = str)
-        meta = [(n, getattr(hdf.root.DataMatx.attrs, n)) for n in hdf.root.DataMatx.attrs._f_list('user')]
-
-        rnam = np.array(hdf.root.RowNames.read(), dtype = str) if hasattr(hdf.root, 'RowNames') else None
-        cnam = np.array(hdf.root.ColNames.read(), dtype = str) if hasattr(hdf.root, 'ColNames') else None
-        ridx = StructuredArray.fromhtable(hdf.root.RowIndex) if hasattr(hdf.root, 'RowIndex') else None
-        cidx = StructuredArray.fromhtable(hdf.root.ColIndex) if hasattr(hdf.root, 'ColIndex') else None
-
-        hdf.close()
-        return Table(darr, rownames = rnam, colnames = cnam, rowindex = ridx, colindex = cidx, metadata = meta)
+        with ptb.open_file(fname, mode = 'r') as hdf:
+            nr, nc = hdf.root.DataMatx.shape
+            rids = cls._hdfids(rows, nr, hdf.root.RowNames if hasattr(hdf.root, 'RowNames') else None)
+            cids = cls._hdfids(cols, nc, hdf.root.ColNames if hasattr(hdf.root, 'ColNames') else None)
+            # pytables rejects repeated points, each one is read once and repeated afterwards
+            _dedup = lambda x: (x, None) if isinstance(x, slice) or np.unique(x).shape[0] == x.shape[0] else np.unique(x, return_inverse = True)
+            (rids, rinv), (cids, cinv) = _dedup(rids), _dedup(cids)
+            tab = cls._readhdf(hdf, rids, cids)
+        if available(rinv) or available(cinv): tab = tab[optional(rinv, slice(None)), optional(cinv, slice(None))]
+        return tab
 
-    def savehdf(self, fname: Union[str, Path], compression: int = 0) -> bool:
+    @classmethod
+    def iterchunks(cls, fname: Union[str, Path], chunksize: int = 10000, *, filetype: str = 'csv', delimiter: str = ',',
+                   dtype: Optional[Union[str, type, np.ndarray.dtype]] = None, headerpos: Optional[Union[Sequence[int], np.ndarray]] = None) -> Iterator[Table]:
+        if validarg(filetype, ('csv', 'hdf')) == 'csv': return cls._readcsv(fname, delimiter, dtype, headerpos, chunksize = chunksize)
+
+        def _iter():
+            checkInputFile(fname)
+            with ptb.open_file(fname, mode = 'r') as hdf:
+                cnam = NamedIndex(np.array(hdf.root.ColNames.read(), dtype = str)) if hasattr(hdf.root, 'ColNames') else None
+                cidx = StructuredArray.fromhtable(hdf.root.ColIndex) if hasattr(hdf.root, 'ColIndex') else None
+                for start in range(0, hdf.root.DataMatx.shape[0], chunksize):
+                    yield cls._readhdf(hdf, slice(start, start + chunksize), colnames = cnam, colindex = cidx)
+        return _iter()
+
+    def savehdf(self, fname: Union[str, Path], compression: int = 0, *, layout: str = 'array', complib: str = 'zlib',
+                chunkshape: Optional[Sequence[int]] = None, strwidth: Optional[int] = None) -> bool:
+        validarg(layout, ('array', 'chunked', 'extendable'))
+        swd = strwidth if layout == 'extendable' else None # minimal string width for rows appended later
         checkOutputFile(fname)
-        hdf = ptb.open_file(fname, mode = 'w', filters = ptb.Filters(compression))
+        hdf = ptb.open_file(fname, mode = 'w', filters = ptb.Filters(compression, complib = complib))
 
-        darr = hdf.create_array(hdf.root, 'DataMatx', self._dmatx)
+        if layout == 'array':
+            darr = hdf.create_array(hdf.root, 'DataMatx', self._dmatx)
+        elif layout == 'chunked':
+            darr = hdf.create_carray(hdf.root, 'DataMatx', obj = self._hdfencode(self._dmatx), chunkshape = chunkshape)
+        else:
+            darr = hdf.create_earray(hdf.root, 'DataMatx', obj = self._hdfencode(self._dmatx, minwidth = swd), chunkshape = chunkshape)
         for k,v in self._metas.items(): setattr(darr.attrs, k, v)
 
-        if available(self._rnames): hdf.create_array(hdf.root, 'RowNames', np.array(self._rnames))
+        _create = hdf.create_earray if layout == 'extendable' else hdf.create_array # row names grow with the data
+        if available(self._rnames): _create(hdf.root, 'RowNames', obj = self._hdfencode(self._rnames.encode(), minwidth = swd))
         if available(self._cnames): hdf.create_array(hdf.root, 'ColNames', np.array(self._cnames))
-        if available(self._rindex): self._rindex.tohtable(hdf.root, 'RowIndex')
+        if available(self._rindex): self._rindex.tohtable(hdf.root, 'RowIndex', strwidth = swd)
         if available(self._cindex): self._cindex.tohtable(hdf.root, 'ColIndex')
 
         hdf.close()
         return os.path.isfile(fname)
 
+    def appendhdf(self, fname: Union[str, Path]) -> bool:
+        checkInputFile(fname)
+        with ptb.open_file(fname, mode = 'a') as hdf:
+            darr = hdf.root.DataMatx
+            if not isinstance(darr, ptb.EArray): raise TypeError('hdf file is not saved in extendable layout')
+            if darr.shape[1] != self.ncol: raise IndexError('input table has different number of columns')
+            if (self.dtype.kind in ('U', 'S')) != (darr.atom.dtype.kind == 'S') or \
+               (darr.atom.dtype.kind != 'S' and not np.can_cast(self.dtype, darr.atom.dtype)):
+                raise TypeError('input table has incompatible data type') # would be silently truncated by pytables
+            if hasattr(hdf.root, 'ColNames') != available(self._cnames) or \
+               (available(self._cnames) and np.any(self._cnames != np.array(hdf.root.ColNames.read(), dtype = str))):
+                raise IndexError('input table has different column names')
+            if hasattr(hdf.root, 'ColIndex') != available(self._cindex) or \
+               (available(self._cindex) and StructuredArray.fromhtable(hdf.root.ColIndex) != self._cindex):
+                raise IndexError('input table has different column index')
+            if hasattr(hdf.root, 'RowNames') != available(self._rnames): raise IndexError('input table has different row names')
+            if hasattr(hdf.root, 'RowIndex') != available(self._rindex) or \
+               (available(self._rindex) and set(hdf.root.RowIndex.attrs.names) != set(self._rindex.names)):
+                raise IndexError('input table has different row index')
+
+            # strings are stored in fixed width, values longer than that would be silently truncated by pytables
+            dmtx = self._hdfencode(self._dmatx, darr.atom.itemsize)
+            if available(self._rnames):
+                if np.any(np.isin(self._rnames.encode(), hdf.root.RowNames.read())): raise KeyError('input table has duplicated row names')
+                rnam = self._hdfencode(np.array(self._rnames), hdf.root.RowNames.atom.itemsize)
+            if available(self._rindex):
+                ridx = hdf.root.RowIndex
+                ccod = {k: StructuredArray._catencode(self._rindex[k], c) for k,c in (ridx.attrs.categories.items() if hasattr(ridx.attrs, 'categories') else ())}
+                if checkany(ridx.colnames, lambda n: n not in ccod and ridx.coldtypes[n].kind != 'S' and not np.can_cast(self._rindex[n].dtype, ridx.coldtypes[n])):
+                    raise TypeError('input table has incompatible row index data type')
+                rarr = [ccod[n][0].astype(np.int32) if n in ccod else
+                        self._hdfencode(self._rindex[n], ridx.coldtypes[n].itemsize if ridx.coldtypes[n].kind == 'S' else None) for n in ridx.colnames]
+
+            darr.append(dmtx)
+            if available(self._rnames): hdf.root.RowNames.append(rnam)
+            if available(self._rindex): ridx.append(rarr)
+            if available(self._rindex) and len(ccod) > 0: ridx.attrs.categories = {k: c for k,(_,c) in ccod.items()}
+        return os.path.isfile(fname)
+
+    def save(self, fname: Union[str, Path]) -> bool:
+        fpath = Path(fname)
+        if fpath.is_dir() and not (fpath / 'header.json').is_file(): raise IOError(f'output dir [{fpath}] is not a table container')
+
+        # one raw buffer per array, names and index fields included, so that all of them can be memory mapped
+        bufs = [('data.bin', np.asarray(self._dmatx))]
+        if available(self._rnames): bufs += [('rownames.bin', np.asarray(self._rnames))]
+        if available(self._cnames): bufs += [('colnames.bin', np.asarray(self._cnames))]
+        for nm,idx in (('rowindex', self._rindex), ('colindex', self._cindex)):
+            if available(idx): bufs += [(f'{nm}_{i}.bin', idx[k]) for i,k in enumerate(idx.names)]
+        if checkany(bufs, lambda x: x[1].dtype.kind == 'O'): raise TypeError('object arrays not supported in native format')
+
+        descs = {n: {'file': n, 'dtype': v.dtype.str, 'shape': list(v.shape)} for n,v in bufs}
+        _index = lambda idx,nm: None if missing(idx) else [dict(descs[f'{nm}_{i}.bin'], name = k) for i,k in enumerate(idx.names)]
+        header = {
+            'format': 'kagami.table', 'version': 1,
+            'data': descs['data.bin'],
+            'rownames': descs.get('rownames.bin'),
+            'colnames': descs.get('colnames.bin'),
+            'rowindex': _index(self._rindex, 'rowindex'),
+            'colindex': _index(self._cindex, 'colindex'),
+            'metadata': 'metadata.pkl',
+        }
+
+        checkOutputDir(fpath, override = True)
+        for n,v in bufs: np.ascontiguousarray(v).tofile(fpath / n)
+        with open(fpath / 'metadata.pkl', 'wb') as f: pickle.dump(self._metas, f)
+        with open(fpath / 'header.json', 'w') as f: json.dump(header, f, indent = 2)
+        return (fpath / 'header.json').is_file()
+
+    @classmethod
+    def load(cls, fname: Union[str, Path], mode: str = 'r') -> Table:
+        validarg(mode, ('r', 'r+', 'c'))
+        fpath = Path(fname)
+        checkInputDir(fpath)
+        checkInputFile(fpath / 'header.json')
+        with open(fpath / 'header.json', 'r') as f: header = json.load(f)
+        if header.get('format') != 'kagami.table': raise ValueError(f'unknown table container format in [{fpath}]')
+
+        def _map(desc):
+            shape = tuple(desc['shape'])
+            if np.prod(shape) == 0: return np.empty(shape, dtype = desc['dtype']) # empty file cannot be mapped
+            return np.memmap(fpath / desc['file'], dtype = desc['dtype'], mode = mode, shape = shape)
+
+        def _index(descs):
+            if missing(descs): return None
+            sarr = StructuredArray()
+            for desc in descs: sarr._bind(desc['name'], _map(desc))
+            return sarr
+
+        with open(fpath / header['metadata'], 'rb') as f: meta = pickle.load(f)
+        dmtx = _map(header['data'])
+        ntab = Table(dmtx, copy = False, metadata = meta,
+                     rownames = _map(header['rownames']) if available(header['rownames']) else None,
+                     colnames = _map(header['colnames']) if available(header['colnames']) else None,
+                     rowindex = _index(header['rowindex']), colindex = _index(header['colindex']))
+        if isinstance(dmtx, np.memmap):
+            ntab._dmatx = dmtx
+            ntab._memmap = Metadata(file = fpath / header['data']['file'], dtype = dmtx.dtype, shape = dmtx.shape, mode = mode)
+        return ntab
+
     @classmethod
     def loadrdata(cls, fname: Union[str, Path], dataobj: str, *,
                   ridxobj: Optional[str] = None, cidxobj: Optional[str] = None, transposed: bool = True) -> Table:
@@ -579,3 +1042,72 @@ class Table(CoreType):
         vnames = [dataobj] + ([ridxobj] if available(ri) else []) + ([cidxobj] if available(ci) else [])
         rw.run(f'save({paste(vnames, sep = ",")}, file = "{fname}")') # avoid bug in rw.save
         return os.path.isfile(fname)
+
+
+# table builder
+class TableBuilder:
+    __slots__ = ('_dmatx', '_rnames', '_rindex', '_templ', '_nrow', '_capacity')
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = capacity
+        self._reset()
+
+    # privates
+    def _reset(self):
+        self._dmatx = self._rnames = self._rindex = self._templ = None
+        self._nrow = 0
+
+    def _fit(self, buf, dtype, size):
+        # double the capacity when full, string buffers also widen to hold longer values
+        ntype = np.result_type(buf.dtype, dtype) if buf.dtype.kind in ('U', 'S') and dtype.kind == buf.dtype.kind else buf.dtype
+        if size <= buf.shape[0] and ntype == buf.dtype: return buf
+        nbuf = np.empty((max(size, 2 * buf.shape[0]),) + buf.shape[1:], dtype = ntype)
+        nbuf[:self._nrow] = buf[:self._nrow]
+        return nbuf
+
+    # built-ins
+    def __len__(self):
+        return self._nrow
+
+    # publics
+    def append(self, value: Table) -> TableBuilder:
+        if not isinstance(value, Table): raise TypeError('unknown input data type')
+        if missing(self._templ):
+            cap = max(self._capacity, value.nrow)
+            self._templ = value.take(slice(0, 0))
+            self._dmatx = np.empty((cap, value.ncol), dtype = value.dtype)
+            self._rnames = np.empty(cap, dtype = object) if available(value.rows_) else None
+            self._rindex = OrderedDict([(k, np.empty(cap, dtype = value.ridx_[k].dtype)) for k in value.ridx_.names]) if available(value.ridx_) else None
+
+        templ = self._templ
+        if value.ncol != templ.ncol: raise IndexError('input table has different number of columns')
+        if available(templ.cols_) and available(value.cols_) and np.any(value.cols_ != templ.cols_): raise IndexError('input table has different column names')
+        if available(templ.cidx_) and available(value.cidx_) and value.cidx_ != templ.cidx_: raise IndexError('input table has different column index')
+        if available(self._rnames) and missing(value.rows_): raise IndexError('input table has different row names')
+        if available(self._rindex) and (missing(value.ridx_) or set(value.ridx_.names) != set(self._rindex.keys())): raise IndexError('input table has different row index')
+
+        size = self._nrow + value.nrow
+        self._dmatx = self._fit(self._dmatx, value.dtype, size)
+        self._dmatx[self._nrow:size] = value._dmatx
+        if available(self._rnames):
+            self._rnames = self._fit(self._rnames, self._rnames.dtype, size)
+            self._rnames[self._nrow:size] = np.asarray(value.rows_)
+        if available(self._rindex):
+            for k,v in self._rindex.items():
+                val = value.ridx_[k]
+                self._rindex[k] = v = self._fit(v, val.dtype, size)
+                v[self._nrow:size] = val
+        self._nrow = size
+        return self
+
+    def build(self) -> Table:
+        if missing(self._templ): raise ValueError('no table appended to builder')
+        n, templ = self._nrow, self._templ
+        ntab = Table(
+            self._dmatx[:n], copy = False, # data matrix is taken over without copying
+            rownames = self._rnames[:n] if available(self._rnames) else None,
+            rowindex = [(k, v[:n]) for k,v in self._rindex.items()] if available(self._rindex) else None,
+            colnames = templ.cols_, colindex = templ.cidx_, metadata = templ.metadata,
+        )
+        self._reset()
+        return ntab
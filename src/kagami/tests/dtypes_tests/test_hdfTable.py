@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+test_dtypes_hdfTable
+
+author(s): Albert (aki) Zhou
+added: 10-18-2026
+
+"""
+
+
+import os, pytest
+import numpy as np
+from kagami.comm import Metadata
+from kagami.dtypes import Table, HDFTable
+
+
+def _create_table():
+    table = Table(np.arange(600).reshape((20,30)), dtype = int,
+                  rownames = map(lambda x: 'row_%d' % x, range(20)),
+                  colnames = map(lambda x: 'col_%d' % x, range(30)),
+                  rowindex = {'type': ['a', 'b', 'c', 'd'] * 5, 'order': np.arange(20)},
+                  colindex = [('gene', map(lambda x: 'gid_%d' % x, range(30)))],
+                  metadata = {'name': 'test_table', 'extra': Metadata(val1 = 1, val2 = 2)})
+    return table
+
+def test_hdfTable_properties():
+    table = _create_table()
+    fname = 'test_hdfTable_properties.hdf'
+    table.savehdf(fname)
+
+    with HDFTable(fname) as htab:
+        assert htab.shape == table.shape and htab.nrow == 20 and htab.ncol == 30 and len(htab) == 20
+        assert htab.dtype == table.dtype and htab.metadata['name'] == 'test_table'
+        assert np.all(htab.rows_ == table.rows_) and np.all(htab.cols_ == table.cols_)
+        assert htab.ridx_ == table.ridx_ and htab.cidx_ == table.cidx_
+        print(htab)
+    if os.path.isfile(fname): os.remove(fname)
+
+def test_hdfTable_methods_take():
+    table = _create_table()
+    fname = 'test_hdfTable_take.hdf'
+    table.savehdf(fname, layout = 'chunked', chunkshape = (4, 4))
+
+    htab = HDFTable(fname, blockshape = (3, 7), cachesize = 4)
+    assert htab[:] == table
+    assert htab[2:9,['col_3', 'col_28', 'col_0']] == table[2:9,['col_3', 'col_28', 'col_0']]
+    assert htab[[-1, 5, 2],::4] == table[[-1, 5, 2],::4]
+    assert htab.take(['row_7', 'row_1']) == table.take(['row_7', 'row_1'])
+    assert htab.take([True, False] * 15, axis = 1) == table.take([True, False] * 15, axis = 1)
+    assert htab[3,4].X_[0,0] == 94 and htab[3,4].metadata['name'] == 'test_table'
+    assert len(htab._cache) <= 4
+    htab.close()
+    with pytest.raises(IOError): htab[0]
+
+    table.astype(str).savehdf(fname)
+    with HDFTable(fname) as htab: assert htab[1:3] == table.astype(str)[1:3]
+    stab = table.astype(str)
+    stab[1,2] = 'gène'
+    stab.savehdf(fname, layout = 'chunked')
+    with HDFTable(fname) as htab: assert htab[1:3] == stab[1:3] and htab[1,2].X_[0,0] == 'gène'
+    if os.path.isfile(fname): os.remove(fname)
@@ -166,9 +166,116 @@ def test_namedIndex_methods_indexing():
     assert isinstance(idx.idsof('cc'), int) and idx.idsof('cc') == 2
     assert np.all(idx.idsof(['a', 'dddd']) == [0,3])
     assert np.all(idx.idsof([0, 'dddd']) == [0,3])
-    assert idx.idsof(['a', 'b', 'cc'], safe = True) == [0, None, 2]
+    assert np.all(idx.idsof(['z', 1, -1], safe = True) == [-1, 1, 3]) and idx.idsof(['z', 1], safe = True).dtype.kind == 'i'
+    with pytest.raises(KeyError): idx.idsof(['z', 1])
+    assert np.all(idx.idsof(['a', 'b', 'cc'], safe = True) == [0, -1, 2])
     with pytest.raises(KeyError): idx.idsof(['a', 'b', 'cc'])
 
+def test_namedIndex_methods_bulk_indexing():
+    idx, vals = _create_namedIndex()
+
+    ids = idx.idsof(np.array(['dddd', 'a', 'cc']))
+    assert isinstance(ids, np.ndarray) and ids.dtype.kind == 'i' and np.all(ids == [3, 0, 2])
+    assert np.all(idx.idsof(iter(['zz', 'bbb', '']), safe = True) == [-1, 1, -1])
+    assert idx.idsof([]).shape == (0,) and np.all(NamedIndex().idsof(['a'], safe = True) == [-1])
+
+    nidx = idx.copy()
+    nidx['bbb'] = 'zz'
+    assert np.all(nidx.idsof(['zz', 'bbb'], safe = True) == [1, -1]) and np.all(idx.idsof(['zz', 'bbb'], safe = True) == [-1, 1])
+    nidx.append(['b0', 'e'], inline = True)
+    assert np.all(nidx.idsof(['e', 'b0', 'dddd']) == [5, 4, 3])
+    nidx.delete('a', inline = True)
+    assert np.all(nidx.idsof(['e', 'zz']) == [4, 0])
+
+    bidx = NamedIndex(['g%06d' % i for i in np.random.permutation(10000)])
+    qry = np.array(['g%06d' % i for i in range(0, 10000, 7)])
+    assert np.all(bidx.namesof(bidx.idsof(qry)) == qry)
+
+def test_namedIndex_methods_set_operations():
+    idx, vals = _create_namedIndex()
+    oidx = NamedIndex(['e', 'cc', 'a', 'f'])
+
+    assert 'cc' in idx and 'e' not in idx and 1 not in idx
+    assert np.all(idx.intersect(oidx) == ['a', 'cc']) and np.all(idx.intersect(['dddd', 'x']) == ['dddd'])
+    assert np.all(idx.union(oidx) == ['a', 'bbb', 'cc', 'dddd', 'e', 'f']) and idx.union(oidx).idsof('f') == 5
+    assert np.all(idx.difference(oidx) == ['bbb', 'dddd']) and idx.difference(idx).size == 0
+
+    nid, lids, rids = idx.align(oidx)
+    assert np.all(nid == ['a', 'cc']) and np.all(lids == [0, 2]) and np.all(rids == [2, 1])
+    nid, lids, rids = idx.align(oidx, how = 'left')
+    assert np.all(nid == vals) and np.all(lids == [0, 1, 2, 3]) and np.all(rids == [2, -1, 1, -1])
+    nid, lids, rids = idx.align(oidx, how = 'right')
+    assert np.all(nid == oidx) and np.all(lids == [-1, 2, 0, -1]) and np.all(rids == [0, 1, 2, 3])
+    nid, lids, rids = idx.align(oidx, how = 'outer')
+    assert np.all(nid == ['a', 'bbb', 'cc', 'dddd', 'e', 'f']) and np.all(lids == [0, 1, 2, 3, -1, -1]) and np.all(rids == [2, -1, 1, -1, 0, 3])
+    with pytest.raises(ValueError): idx.align(oidx, how = 'cross')
+
+def test_namedIndex_methods_lazy_hash():
+    idx, vals = _create_namedIndex()
+
+    sidx = idx.take([3, 1, 0])
+    assert sidx._nidct is None and idx[1:]._nidct is None and idx.delete(0)._nidct is None
+    assert sidx.idsof('a') == 2 and sidx._nidct is not None
+    with pytest.raises(KeyError): idx.take([0, 1, -4])
+    with pytest.raises(KeyError): NamedIndex(['a', 'b', 'a'])
+    with pytest.raises(KeyError): idx.insert(1, ['e', 'cc'])
+
+    nidx = idx.take([True, False, True, True])
+    nidx.append('e', inline = True)
+    assert nidx._nidct is None and nidx.idsof('e') == 3
+    nidx.append('f', inline = True)
+    assert nidx._nidct is not None and nidx.f == 4
+    with pytest.raises(KeyError): nidx.append('a')
+    nidx[0] = 'a'
+    assert nidx.a == 0
+    with pytest.raises(KeyError): nidx.put(0, 'cc')
+    assert nidx.a == 0 and 'a' in nidx and np.all(pkl.loads(pkl.dumps(nidx)) == nidx)
+
+def test_namedIndex_methods_compact():
+    idx, vals = _create_namedIndex()
+
+    cidx = NamedIndex(vals, compact = True)
+    assert cidx.compact and not idx.compact and cidx._names.dtype.kind == 'S' and cidx._nidct is None
+    assert np.all(cidx == idx) and np.all(cidx.names == vals) and list(cidx) == list(vals) and cidx.tolist() == idx.tolist()
+    assert cidx.cc == 2 and 'dddd' in cidx and 'e' not in cidx and cidx[1] == 'bbb' and cidx[1:].compact
+    assert np.all(cidx.idsof(['dddd', 'a']) == [3, 0]) and np.all(cidx.namesof([0, 2]) == ['a', 'cc'])
+    assert np.all(cidx.idsof(['dddd', 1]) == [3, 1]) and cidx._nidct is None and cidx.append('e').compact
+    assert NamedIndex(cidx).compact and not NamedIndex(cidx, compact = False).compact
+    with pytest.raises(KeyError): NamedIndex(['a', 'é', 'a'], compact = True)
+
+    nidx = cidx.copy()
+    nidx[0] = 'aé' * 4
+    nidx[[1, 2]] = ['b', 'c']
+    assert np.all(nidx == ['aé' * 4, 'b', 'c', 'dddd']) and np.all(cidx == vals) and nidx.idsof('aé' * 4) == 0
+    with pytest.raises(KeyError): nidx[1] = 'c'
+    nidx = nidx.insert(1, ['e']).append('f')
+    assert np.all(nidx == ['aé' * 4, 'e', 'b', 'c', 'dddd', 'f']) and nidx.f == 5
+    with pytest.raises(KeyError): nidx.append('e')
+
+    assert np.all(cidx.union(['e', 'a']) == ['a', 'bbb', 'cc', 'dddd', 'e']) and cidx.union(['e']).compact
+    assert np.all(idx.union(NamedIndex(['e', 'a'], compact = True)) == ['a', 'bbb', 'cc', 'dddd', 'e'])
+    assert np.all(NamedIndex(['é', 'a'], compact = True).union(NamedIndex(['ü', 'é'], compact = True)) == ['é', 'a', 'ü'])
+    assert np.all(cidx.intersect(idx[1:3]) == ['bbb', 'cc']) and np.all(cidx.difference(['a']) == vals[1:])
+    assert np.all(np.char.decode(cidx.encode(), 'utf-8') == vals) and np.all(idx.encode() == cidx.encode())
+
+    pidx = pkl.loads(pkl.dumps(cidx))
+    assert pidx.compact and np.all(pidx == cidx)
+    pidx.compact = False
+    assert not pidx.compact and pidx._names.dtype.kind == 'O' and pidx.bbb == 1
+
+def test_namedIndex_methods_unique_names():
+    assert np.all(NamedIndex.uniquenames(['a', 'b', 'a', 'c', 'a', 'b']) == ['a', 'b', 'a.1', 'c', 'a.2', 'b.1'])
+    assert np.all(NamedIndex.uniquenames(np.array(['x', 'x']), suffix = '_{}') == ['x', 'x_1'])
+    assert NamedIndex.uniquenames([]).shape == (0,)
+
+    idx, vals = _create_namedIndex()
+    assert np.all(NamedIndex.uniquenames(idx) == vals)
+    assert np.all(idx == vals)
+
+    with pytest.raises(TypeError): NamedIndex(['a', 1])
+    with pytest.raises(TypeError): NamedIndex(np.array([['a', 'b']]))
+    with pytest.raises(TypeError): NamedIndex.uniquenames(['a', None])
+
 def test_namedIndex_methods_manipulations():
     idx, vals = _create_namedIndex()
 
@@ -212,6 +319,17 @@ def test_namedIndex_methods_manipulations():
 
     assert np.all(idx == vals)
 
+def test_namedIndex_methods_views():
+    idx, vals = _create_namedIndex()
+
+    cidx = idx[1:3]
+    assert np.all(cidx == vals[1:3]) and cidx.bbb == 0 and 'a' not in cidx
+    cidx[0] = 'ee'
+    assert np.all(cidx == ['ee', 'cc']) and np.all(idx == vals)
+    cidx = idx[1:]
+    idx[1] = 'ff'
+    assert np.all(cidx == vals[1:]) and np.all(idx == ['a', 'ff', 'cc', 'dddd'])
+
 def test_namedIndex_methods_converts():
     idx, vals = _create_namedIndex()
     assert np.all(idx.tolist() == vals)
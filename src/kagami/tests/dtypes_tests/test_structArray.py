@@ -15,7 +15,7 @@ import pickle as pkl
 import numpy as np
 from pathlib import Path
 from copy import deepcopy
-from kagami.comm import smap
+from kagami.comm import smap, available, missing
 from kagami.dtypes import NamedIndex, StructuredArray
 
 
@@ -184,6 +184,143 @@ def test_structArray_methods_copy():
     assert arr == arr.copy()
     assert arr is not arr.copy()
 
+def test_structArray_methods_copy_on_write():
+    arr = _create_structArray()
+
+    carr = arr.copy()
+    carr.ser1[0] = -1
+    carr[['ser2'],1:3] = 0
+    assert np.all(arr.ser1 == [1,3,5,7,9]) and np.all(arr.ser2 == [0.2, 0.4, 0.6, 0.8, 1.0])
+    assert carr.ser1[0] == -1 and np.all(carr.ser2[1:3] == 0)
+
+    varr = arr[:,1:3]
+    arr.ser3[1] = 'vv'
+    assert np.all(varr.ser3 == ['v2', 'v3']) and arr.ser3[1] == 'vv'
+
+def test_structArray_methods_consolidate():
+    arr = _create_structArray()
+
+    carr = arr.consolidate()
+    assert carr == arr and len(carr._blocks) == 5 and len(carr._blocks[2][1]) == 2 # ser3 and ser6 share the same dtype
+    assert carr[:,[4,0,2]] == arr[:,[4,0,2]] and carr[['ser6', 'ser1'],[True, False, True, False, True]] == arr[['ser6', 'ser1'],[True, False, True, False, True]]
+    assert carr.delete([0,-1], axis = 1) == arr.delete([0,-1], axis = 1) and carr.insert(1, 1) == arr.insert(1, 1)
+    assert np.all(np.array(carr) == np.array(arr)) and pkl.loads(pkl.dumps(carr)) == carr
+
+    carr = StructuredArray(a = [1, 2, 3], b = [4, 5, 6]).consolidate(capacity = 4)
+    buf = carr._blocks[0][0]
+    carr.append([[4], [7]], inline = True)
+    assert carr._blocks[0][0] is buf and np.all(carr.a == [1, 2, 3, 4])
+    carr.append([[5], [8]], inline = True)
+    assert carr._blocks[0][0].shape == (8, 2) and np.all(carr.b == [4, 5, 6, 7, 8])
+
+    rarr = np.asarray(carr)
+    assert np.shares_memory(rarr, carr._blocks[0][0]) and not rarr.flags.writeable
+    carr.a[0] = -1
+    assert rarr['a'][0] == 1 and carr.a[0] == -1
+
+    narr = carr.append([[1.5], [9]])
+    assert narr.a.dtype.kind == 'f' and np.all(narr.a == [-1, 2, 3, 4, 5, 1.5]) and carr.length == 5
+    narr['b'] = np.zeros(6)
+    del narr['a']
+    assert np.all(narr.names == ['b']) and np.all(narr.b == 0) and len(narr._blocks) == 0
+
+def test_structArray_methods_categorical():
+    arr = _create_structArray()
+
+    carr = arr.categorize(['ser3', 'ser5'])
+    assert carr == arr and carr._arrs['ser5'].dtype == np.int8 and np.all(carr.categories['ser5'] == ['r', 'g', 'b'])
+    assert np.all(carr.ser5 == arr.ser5) and carr[:,[4,0,2]] == arr[:,[4,0,2]] and np.all(np.array(carr) == np.array(arr))
+    assert np.all(carr.isin('ser5', 'g') == (arr.ser5 == 'g')) and np.all(carr.isin('ser5', ['r', 'b', 'x']) == [True, False, False, True, False])
+    assert carr.append(arr[:,:2]) == arr.append(arr[:,:2]) and carr.delete([0,2], axis = 1) == arr.delete([0,2], axis = 1)
+    assert carr.insert(1, arr[:,-1]) == arr.insert(1, arr[:,-1]) and carr.consolidate().append(1) == arr.append(1)
+
+    narr = carr.copy()
+    narr['ser5', 1:3] = 'y'
+    narr[['ser5'], [0]] = 'rrr'
+    assert np.all(narr.ser5 == ['rrr', 'y', 'y', 'b', 'g']) and np.all(narr.categories['ser5'] == ['r', 'g', 'b', 'y', 'rrr'])
+    assert np.all(carr.ser5 == arr.ser5) and np.all(carr.categories['ser5'] == ['r', 'g', 'b'])
+    with pytest.raises(ValueError): narr['ser5'][0] = 'z'
+    with pytest.raises(ValueError): narr.ser5[0] = 'z'
+    assert narr.ser5[0] == 'rrr'
+    narr['ser5'] = ['a'] * 5
+    assert 'ser5' not in narr.categories and narr._arrs['ser5'].dtype.kind == 'U'
+    assert StructuredArray(x = np.arange(300)).categorize('x')._arrs['x'].dtype == np.int16
+
+    marr = StructuredArray(f = [1., np.nan, 2.], s = np.array(['a', None, 'b'], dtype = object)).categorize(['f', 's'])
+    assert np.allclose(marr.f, [1., np.nan, 2.], equal_nan = True) and marr.s.tolist() == ['a', None, 'b']
+    marr.append(StructuredArray(f = [np.nan], s = np.array([None], dtype = object)), inline = True)
+    assert np.isnan(marr.f[-1]) and marr.s[-1] is None and marr.categories['s'].shape == (3,)
+
+    assert pkl.loads(pkl.dumps(carr)) == carr
+    assert StructuredArray.fromsarray(carr.tosarray()).categories.keys() == {'ser3', 'ser5'}
+    fname = Path('test_structArray.hdf')
+    carr.savehdf(fname)
+    larr = StructuredArray.loadhdf(fname)
+    assert larr == arr and larr.categories.keys() == {'ser3', 'ser5'} and larr._arrs['ser5'].dtype == np.int8
+    if fname.is_file(): fname.unlink()
+
+def test_structArray_methods_field_indexes():
+    arr = _create_structArray()
+
+    for kind in (None, 'hash', 'sorted'):
+        carr = arr.categorize('ser5')
+        if available(kind): carr.createindex('ser5', kind); carr.createindex('ser1', kind)
+        assert np.all(carr.lookup('ser5', 'g') == [1, 2, 4]) and np.all(carr.lookup('ser5', ['b', 'r', 'x']) == [0, 3])
+        assert np.all(carr.lookup('ser1', lower = 3, upper = 9) == [1, 2, 3]) and np.all(carr.lookup('ser1', upper = 3) == [0])
+        assert carr.lookup('ser5', 'x').shape == (0,)
+
+        carr.insert(0, arr[:,-1], inline = True)
+        assert np.all(carr.lookup('ser5', 'g') == [0, 2, 3, 5])
+        carr['ser5', [2, 3]] = 'r'
+        carr.delete(-1, axis = 1, inline = True)
+        assert np.all(carr.lookup('ser5', 'g') == [0]) and np.all(carr.lookup('ser1', lower = 7) == [0, 4])
+        carr['ser1', 0] = 1
+        assert np.all(carr.lookup('ser1', 1) == [0, 1])
+        if available(kind):
+            eng = carr._fidx['ser1'][1]
+            assert np.all(carr.ser1 >= 0) and np.all(carr['ser1'] >= 0) and len(carr.arrays) == carr.size and carr._fidx['ser1'][1] is eng
+            with pytest.raises(ValueError): carr.ser1[0] = 2
+            assert carr.ser1[0] == 1
+        assert np.all(carr[:,[4, 0]].lookup('ser5', 'g') == [1]) and np.all(pkl.loads(pkl.dumps(carr)).lookup('ser5', 'r') == [1, 2, 3])
+        assert carr[:,1:].indexes == ({} if missing(kind) else {'ser5': kind, 'ser1': kind})
+
+        farr = StructuredArray(f = [.5, np.nan, 2, 3])
+        if available(kind): farr.createindex('f', kind)
+        assert np.all(farr.lookup('f', lower = 1) == [2, 3]) and farr.lookup('f', np.nan).shape == (0,)
+
+    with pytest.raises(KeyError): arr.createindex('ser7')
+    with pytest.raises(ValueError): arr.createindex('ser1', 'btree')
+    with pytest.raises(KeyError): arr.dropindex('ser1')
+    carr = arr.copy()
+    carr.createindex('ser1')
+    carr.dropindex('ser1')
+    assert arr.indexes == carr.indexes == {}
+
+def test_structArray_methods_query():
+    arr = _create_structArray()
+
+    for kind in (None, 'hash', 'sorted'):
+        carr = arr.copy()
+        if available(kind): carr.createindex('ser1', kind); carr.createindex('ser5', kind)
+        assert np.all(carr.query("ser5 in ('r', 'b') and ser1 > 3") == [3]) and np.all(carr.query("ser5 == 'g'") == [1, 2, 4])
+        assert np.all(carr.query('3 <= ser1') == [1, 2, 3, 4]) and np.all(carr.query('ser1 <= 3 or not ser4') == [0, 1, 3])
+        assert np.all(carr.query('3 < ser1 < 9') == [2, 3]) and np.all(carr.query('ser1 * ser2 > 4') == [3, 4])
+        assert np.all(carr.query("ser5 != 'g'") == [0, 3]) and np.all(carr.query("ser5 not in ['g', 'x']") == [0, 3])
+        assert np.all(carr.query('ser4') == [1, 2, 4]) and np.all(carr.query('-ser1 >= -1') == [0]) and carr.query("ser5 == 'x'").shape == (0,)
+        assert carr.query("ser5 in 'rg'").shape == (0,) and np.all(carr.query("ser5 in 'g'") == [1, 2, 4])
+
+        farr = StructuredArray(f = [.5, np.nan, 2, 3])
+        if available(kind): farr.createindex('f', kind)
+        with pytest.raises(TypeError): carr.query("ser1 == '1'")
+        with pytest.raises(TypeError): farr.query("f > 'a'")
+        assert carr.query("ser1 in ['1', '3']").shape == (0,) and carr.query('ser5 in [1]').shape == (0,)
+        assert np.all(farr.query('f > 1') == [2, 3]) and np.all(farr.query('f >= .5') == [0, 2, 3]) and np.all(farr.query('f < 3') == [0, 2])
+
+    with pytest.raises(ValueError): arr.query('ser1 ==')
+    with pytest.raises(ValueError): arr.query('ser1 is None')
+    with pytest.raises(ValueError): arr.query("ser3.startswith('v')")
+    with pytest.raises(KeyError): arr.query('ser7 > 1')
+
 def test_structArray_portals():
     arr = _create_structArray()
 
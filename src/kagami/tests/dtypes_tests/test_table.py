@@ -10,13 +10,14 @@ added: 08-20-2018
 """
 
 
-import os, pytest
+import os, shutil, pytest
+import multiprocessing as mp
 import pickle as pkl
 import numpy as np
 import pandas as pd
 from copy import deepcopy
-from kagami.comm import smap, Metadata
-from kagami.dtypes import NamedIndex, Table
+from kagami.comm import l, smap, Metadata
+from kagami.dtypes import NamedIndex, Table, TableBuilder
 
 
 # table
@@ -39,6 +40,7 @@ def test_table_creation():
     fname = 'test_table_memmap'
     Table(np.arange(30).reshape((5,6)), colnames = ['1', '2', '3', '4', '5', '6'], colindex = {'feat': map(str,np.arange(6))}, memmap = fname)
     if os.path.isfile(fname): os.remove(fname)
+    if os.path.isfile(fname + '.meta'): os.remove(fname + '.meta')
 
     with pytest.raises(ValueError): Table(np.arange(10))
     with pytest.raises(ValueError): Table(np.arange(30).reshape((5,6)), rownames = ['a', 'b', 'c'])
@@ -166,6 +168,13 @@ def test_table_built_ins_representations():
     print(str(table))
     print(repr(table))
 
+    table = Table(np.arange(2000000).reshape((1000000, 2)), rowindex = {'order': np.arange(1000000)})
+    table.offload('test_table_repr_memmap')
+    slns = repr(table).split('\n')
+    assert len(slns) == 10 and '[999999]' in slns[-1] and '1999999' in slns[-1] and '[4]' in slns[5]
+    assert len(table.tostring(transpose = True).split('\n')) == 3
+    table.onload(removefile = True)
+
 def test_table_built_ins_numpy_interfaces():
     table = _create_table()
     dm = np.arange(50).reshape((5, 10))
@@ -175,6 +184,33 @@ def test_table_built_ins_pkls():
     table = _create_table()
     assert table == pkl.loads(pkl.dumps(table))
 
+def test_table_built_ins_pkls_legacy():
+    table = _create_table()
+
+    def _legacy(obj, slots):
+        lobj = obj.__class__.__new__(obj.__class__)
+        lobj.__setstate__({k: getattr(obj, k) for k in slots})
+        return lobj
+    # states pickled before the copy-on-write / shared memory / sorted lookup slots were added
+    ltable = _legacy(table, ('_dmatx', '_metas', '_memmap'))
+    ltable._rnames, ltable._cnames = _legacy(table.rows_, ('_names', '_nidct')), _legacy(table.cols_, ('_names', '_nidct'))
+    ltable._rindex, ltable._cindex = _legacy(table.ridx_, ('_arrs', '_length')), _legacy(table.cidx_, ('_arrs', '_length'))
+    ltable = pkl.loads(pkl.dumps(ltable))
+    assert ltable == table
+
+    ctable = ltable.copy()
+    ctable[0,0] = 5
+    ctable.ridx_['order'] = [0, 0, 0, 0, 0]
+    ctable.rows_[0] = 'new_row'
+    ctable.rows_ = ctable.rows_.append('row_5')[:5]
+    assert ctable.X_[0,0] == 5 and ctable.ridx_.order[0] == 0 and ctable.rows_[0] == 'new_row'
+    assert ltable == table and 'row_4' in ltable.rows_
+
+def test_table_properties_compact_names():
+    table = _create_table()
+    table.rows_ = NamedIndex(table.rows_, compact = True)
+    assert table.take(['row_1', 3]) == _create_table()[[1, 3]] and table.rows_.compact and table.rows_._nidct is None
+
 def test_table_properties_values():
     table = _create_table()
     dm = np.arange(50).reshape((5,10))
@@ -267,6 +303,70 @@ def test_table_methods_copy():
     assert table == table.copy()
     assert table is not table.copy()
 
+def test_table_methods_copy_on_write():
+    table = _create_table()
+    dm = np.arange(50).reshape((5,10))
+
+    ctable = table.copy()
+    assert np.shares_memory(np.asarray(ctable), np.asarray(table))
+    with pytest.raises(ValueError): np.asarray(ctable)[0,0] = -1
+    ctable[0,0] = -1
+    ctable.rows_[0] = 'new_row'
+    ctable.ridx_.type[0] = 'z'
+    assert np.all(table.X_ == dm) and table.rows_[0] == 'row_0' and table.ridx_.type[0] == 'a'
+    assert ctable.X_[0,0] == -1 and ctable.rows_[0] == 'new_row' and ctable.ridx_.type[0] == 'z'
+
+    table = _create_table()
+    ttable = table.T
+    assert np.shares_memory(np.asarray(ttable), np.asarray(table))
+    ttable.X_[1,0] = -1
+    assert np.all(table.X_ == dm) and ttable.X_[1,0] == -1
+
+    vtable = table.view_[:2]
+    assert not np.shares_memory(table.copy().X_, vtable.X_)
+
+def test_table_methods_copy_on_write_references():
+    # references taken before the copy must not reach the copy
+    table = _create_table()
+    x, o = table.X_, table.ridx_.order
+    ctable, ttable = table.copy(), table.T
+    x[0,0], o[0] = 42, 42
+    assert ctable.X_[0,0] == 0 and ttable.X_[0,0] == 0 and ctable.ridx_.order[0] == 2
+
+    table = _create_table()
+    x = np.asarray(table)
+    ctable = table.copy()
+    x[0,0] = 42
+    assert ctable.X_[0,0] == 0 and table.X_[0,0] == 42
+
+    sarr = _create_table().ridx_
+    x, (_, y) = sarr.order, sarr.fields[1]
+    carr = sarr.copy()
+    x[1], y[2] = 42, 42
+    assert carr.order[1] == 1 and carr.order[2] == 3 and sarr.order[1] == sarr.order[2] == 42
+
+def test_table_methods_views():
+    table = _create_table()
+    dm = np.arange(50).reshape((5,10))
+
+    vtable = table.view_[1:4,::2]
+    assert vtable == table[1:4,::2]
+    assert np.shares_memory(vtable.X_, table.X_)
+    assert np.all(table.view_['row_2'] == dm[2]) and np.all(table.view_[-1].rownames == ['row_4'])
+    assert np.all(table.take(slice(2,None), axis = 1, view = True).colnames == ['col_%d' % i for i in range(2,10)])
+
+    ftable = table.take([0,2], view = True)
+    assert ftable == table[[0,2]] and not np.shares_memory(ftable.X_, table.X_)
+
+    ctable = deepcopy(table)
+    vtable = ctable.view_[1:3]
+    vtable[0,0] = -1
+    assert ctable.X_[1,0] == -1
+    vtable.rows_[0] = 'new_row'
+    vtable.ridx_['type'][:] = 'z'
+    assert np.all(ctable.rownames == table.rownames) and ctable.ridx_ == table.ridx_
+    assert np.all(vtable.rownames == ['new_row', 'row_2']) and np.all(vtable.ridx_.type == 'z')
+
 def test_table_methods_converts():
     table = _create_table()
 
@@ -335,6 +435,20 @@ def test_table_methods_offload():
     assert table == ctable
     assert not os.path.isfile(fname)
 
+    # reallocated matrix is no longer backed by the file
+    ntab = ctable[:1]
+    ntab.rows_ = ['row_5']
+    table.offload(fname)
+    table.append(ntab, inline = True)
+    assert table.shape == (6, 10) and table._memmap is None and table.onload().shape == (6, 10)
+    assert Table.openmemmap(fname) == ctable
+    table.offload(fname)
+    table.dtype = float
+    assert table._memmap is None and table.onload().shape == (6, 10) and table.dtype == float
+    table.offload(fname).delete(0, inline = True)
+    assert table._memmap is None and table.onload() == ctable[1:].append(ntab).astype(float)
+    os.remove(fname); os.remove(fname + '.meta')
+
 def test_table_methods_portals():
     table = _create_table()
     fname = 'test_table'
@@ -365,3 +479,357 @@ def test_table_methods_portals():
     assert ltable == table
     if os.path.isfile(fname + '.rdata'): os.remove(fname + '.rdata')
 
+def test_table_methods_portals_csv_engines():
+    dm = np.random.rand(150, 6)
+    dm[3,2], dm[5,1] = np.nan, np.inf
+    table = Table(dm, rownames = ['row_%d' % i for i in range(150)], colnames = ['col_%d' % i for i in range(6)],
+                  rowindex = {'type': ['NA', 'a', 'b'] * 50, 'order': np.arange(150)}, colindex = {'gene': ['gid_%d' % i for i in range(6)]})
+    fname = 'test_table_engines.csv'
+
+    table.savecsv(fname)
+    ctable, ptable = Table.loadcsv(fname, engine = 'c'), Table.loadcsv(fname, engine = 'python')
+    assert np.array_equal(ctable.X_, dm, equal_nan = True) and np.array_equal(ptable.X_, dm, equal_nan = True)
+    assert np.all(ctable.rows_ == table.rows_) and np.all(ctable.cols_ == table.cols_)
+    assert ctable.ridx_ == table.ridx_ and ctable.cidx_ == table.cidx_
+    with pytest.raises(ValueError): Table.loadcsv(fname, engine = 'rust')
+
+    table = Table(np.arange(300).reshape((150,2)))
+    table.savecsv(fname)
+    ctable = Table.loadcsv(fname)
+    assert ctable == table and ctable.dtype == table.dtype and ctable.rows_ is None
+    if os.path.isfile(fname): os.remove(fname)
+
+def test_table_methods_portals_chunks():
+    table = _create_table()
+    table = Table(np.tile(table.X_, (5,1)), rownames = ['row_%d' % i for i in range(table.nrow * 5)], colnames = table.cols_,
+                  rowindex = {'order': np.arange(table.nrow * 5)}, colindex = table.cidx_, metadata = table.metadata)
+    fname = 'test_table_chunks'
+
+    table.savecsv(fname + '.csv')
+    tabs = list(Table.iterchunks(fname + '.csv', chunksize = 4))
+    assert [t.nrow for t in tabs] == [4] * (table.nrow // 4) + ([table.nrow % 4] if table.nrow % 4 else [])
+    assert Table.loadcsv(fname + '.csv') == table
+    assert np.all(np.vstack([t.X_ for t in tabs]) == table.X_) and np.all(np.hstack([np.array(t.rows_) for t in tabs]) == np.array(table.rows_))
+    assert np.all(np.hstack([t.ridx_.order for t in tabs]) == table.ridx_.order) and tabs[-1].cidx_ == table.cidx_
+    with pytest.raises(ValueError): Table.iterchunks(fname + '.csv', filetype = 'json')
+    if os.path.isfile(fname + '.csv'): os.remove(fname + '.csv')
+
+    table.savehdf(fname + '.hdf')
+    tabs = list(Table.iterchunks(fname + '.hdf', chunksize = 4, filetype = 'hdf'))
+    assert np.all(np.vstack([t.X_ for t in tabs]) == table.X_) and np.all(np.hstack([np.array(t.rows_) for t in tabs]) == np.array(table.rows_))
+    assert np.all(tabs[0].cols_ == table.cols_) and tabs[0].metadata['name'] == table.metadata['name']
+    assert tabs[0] == table[:4]
+    if os.path.isfile(fname + '.hdf'): os.remove(fname + '.hdf')
+
+def test_table_methods_portals_csv_streaming():
+    table = _create_table()
+    fname = 'test_table_streaming'
+
+    table.savecsv(fname + '_1.csv')
+    table.savecsv(fname + '_2.csv', chunksize = 2)
+    with open(fname + '_1.csv') as f1, open(fname + '_2.csv') as f2: assert f1.read() == f2.read()
+    assert Table.loadcsv(fname + '_2.csv') == table
+    table.savecsv(fname + '_2.csv', chunksize = 3, transpose = True)
+    assert Table.loadcsv(fname + '_2.csv', transposed = True) == table
+
+    table = Table(np.array([[1/3, 2/3], [np.nan, 1e10]]), colnames = ['c1', 'c2'])
+    table.savecsv(fname + '_1.csv', precision = 4)
+    ltable = Table.loadcsv(fname + '_1.csv')
+    assert np.allclose(ltable.X_, table.X_, rtol = 1e-3, equal_nan = True) and not np.array_equal(ltable.X_, table.X_, equal_nan = True)
+    with open(fname + '_1.csv') as f: assert '0.3333' in f.read()
+    for fn in (fname + '_1.csv', fname + '_2.csv'):
+        if os.path.isfile(fn): os.remove(fn)
+
+def test_table_methods_portals_hdf_selection():
+    table = _create_table()
+    fname = 'test_table_selection.hdf'
+
+    table.savehdf(fname)
+    assert Table.loadhdf(fname, rows = [3, 1], cols = ['col_8', 'col_2', 'col_5']) == table[[3, 1]][:,['col_8', 'col_2', 'col_5']]
+    assert Table.loadhdf(fname, rows = slice(1, 4), cols = [False, True] * 5) == table[1:4,[False, True] * 5]
+    assert Table.loadhdf(fname, rows = ['row_4'], cols = [-1]) == table[['row_4'],[-1]]
+    assert Table.loadhdf(fname, cols = slice(None, None, 3)) == table[:,::3]
+    assert Table.loadhdf(fname, rows = []).shape == (0, 10)
+    with pytest.raises(KeyError): Table.loadhdf(fname, rows = ['row_10'])
+    with pytest.raises(KeyError): Table.loadhdf(fname, rows = [1, 1]) # repeated names, as in Table.take
+    assert Table.loadhdf(fname, rows = [4, 2, 0]) == table[[4, 2, 0]]
+    Table(table.X_).savehdf(fname)
+    assert Table.loadhdf(fname, rows = [3, 1, 3], cols = [0, 0]) == Table(table.X_)[[3, 1, 3],[0, 0]]
+    ntab = table.copy()
+    ntab.rows_ = ['gène%d' % i for i in range(5)]
+    ntab.savehdf(fname)
+    assert Table.loadhdf(fname, rows = ['gène3']) == ntab[['gène3']]
+    with pytest.raises(IndexError): Table.loadhdf(fname, rows = [True, False])
+    with pytest.raises(IndexError): Table.loadhdf(fname, cols = [12])
+    if os.path.isfile(fname): os.remove(fname)
+
+def test_table_methods_portals_hdf_layouts():
+    table = _create_table()
+    fname = 'test_table_layouts.hdf'
+
+    table.savehdf(fname, 5, layout = 'chunked', complib = 'blosc:zstd', chunkshape = (2, 5))
+    assert Table.loadhdf(fname) == table
+    table.astype(str).savehdf(fname, layout = 'chunked')
+    assert Table.loadhdf(fname) == table.astype(str)
+    with pytest.raises(ValueError): table.savehdf(fname, layout = 'table')
+    with pytest.raises(TypeError): table.appendhdf(fname)
+
+    table[:2].savehdf(fname, 1, layout = 'extendable', chunkshape = (2, 10))
+    table[2:4].appendhdf(fname)
+    table[4:].appendhdf(fname)
+    assert Table.loadhdf(fname) == table
+    assert list(Table.iterchunks(fname, 3, filetype = 'hdf'))[1] == table[3:]
+    with pytest.raises(KeyError): table[4:].appendhdf(fname)
+    with pytest.raises(IndexError): table[:,:5].appendhdf(fname)
+    ntab = table[:1]
+    ntab.rows_ = ['row_long_name']
+    with pytest.raises(ValueError): ntab.appendhdf(fname)
+    assert Table.loadhdf(fname) == table
+
+    ntab = table[:1]
+    ntab.rows_, ntab.ridx_['type'] = ['row_long_name'], ['long_type']
+    table.savehdf(fname, layout = 'extendable', strwidth = 16)
+    ntab.appendhdf(fname)
+    assert Table.loadhdf(fname) == table.append(ntab)
+    with pytest.raises(TypeError): table.astype(float).appendhdf(fname)
+    with pytest.raises(TypeError): table.astype(str).appendhdf(fname)
+    ntab.rows_, ntab.ridx_['order'] = ['row_float'], [1.5]
+    with pytest.raises(TypeError): ntab.appendhdf(fname)
+    assert Table.loadhdf(fname).shape == (6, 10)
+
+    stab = table.astype(str)
+    stab[0,0] = 'gène'
+    stab[:2].savehdf(fname, layout = 'extendable')
+    stab[2:].appendhdf(fname)
+    assert Table.loadhdf(fname) == stab
+
+    ctab = table.copy()
+    ctab.ridx_ = ctab.ridx_.categorize('type')
+    with pytest.raises(ValueError): ctab.ridx_['type'][0] = 'z'
+    ctab[:3].savehdf(fname, layout = 'extendable')
+    table[3:].appendhdf(fname)
+    ltab = Table.loadhdf(fname)
+    assert ltab == table and np.all(ltab.ridx_.categories['type'] == ['a', 'b', 'c']) and np.all(ltab.ridx_.isin('type', 'a') == [1, 1, 0, 1, 0])
+    if os.path.isfile(fname): os.remove(fname)
+
+def test_table_methods_builder():
+    table = _create_table()
+    table = Table(np.tile(table.X_, (7,1)), rownames = ['row_%d' % i for i in range(35)], colnames = table.cols_,
+                  rowindex = {'type': ['a', 'bb', 'ccc', 'd', 'eeeee'] * 7, 'order': np.arange(35)}, colindex = table.cidx_, metadata = table.metadata)
+
+    builder = TableBuilder(capacity = 2)
+    for i in range(0, 35, 3): builder.append(table[i:i+3])
+    assert len(builder) == 35
+    btab = builder.build()
+    assert btab == table and btab.metadata['name'] == 'test_table' and np.all(btab.ridx_.type == table.ridx_.type)
+    assert len(builder) == 0
+    with pytest.raises(ValueError): builder.build()
+
+    builder.append(table[:2])
+    with pytest.raises(IndexError): builder.append(table[2:4,:5])
+    with pytest.raises(IndexError): builder.append(Table(table[2:4].X_))
+    with pytest.raises(TypeError): builder.append(table[2:4].X_)
+    with pytest.raises(KeyError): builder.append(table[:1]).build()
+
+def test_table_methods_concat():
+    table = _create_table()
+
+    assert Table.concat([table[:1], table[1:3], table[3:]]) == table
+    assert Table.concat([table[:,:4], table[:,4:]], axis = 1) == table
+    assert Table.concat(iter([table])) == table and Table.concat([table]).metadata['name'] == 'test_table'
+    assert Table.concat([table, table[:0]]).shape == table.shape
+    ctab = Table.concat([table[:2], table[2:].astype(float)])
+    assert ctab.dtype == table.dtype and ctab == table
+
+    with pytest.raises(ValueError): Table.concat([])
+    with pytest.raises(TypeError): Table.concat([table, table.X_])
+    with pytest.raises(IndexError): Table.concat([table[:2], table[2:,:5]])
+    with pytest.raises(IndexError): Table.concat([table[:2], table[2:,::-1]])
+    with pytest.raises(IndexError): Table.concat([table[:,:2], Table(table[:,2:].X_)], axis = 1)
+    with pytest.raises(IndexError): Table.concat([table], axis = 2)
+    with pytest.raises(KeyError): Table.concat([table, table])
+
+def test_table_methods_select():
+    table = _create_table()
+
+    table.ridx_.createindex('type')
+    table.ridx_.createindex('order', 'sorted')
+    assert table.select('type', 'a') == table[[0,1,3]] and table.select('type', ['b', 'c']) == table[[2,4]]
+    assert table.select('order', lower = 2, upper = 4) == table[[0,2]] and table.select('gene', 'gid_3', axis = 1) == table[:,3]
+    assert table.select('type', 'x').shape == (0, 10)
+    assert table[::-1].select('type', 'a') == table[[3,1,0]]
+    with pytest.raises(KeyError): table.select('type', 'a', axis = 1)
+
+    ntab = table.delete(0)
+    assert ntab.select('type', 'a') == table[[1,3]] and ntab.ridx_.indexes == {'type': 'hash', 'order': 'sorted'}
+    with pytest.raises(KeyError): Table(np.zeros((2, 2))).select('type', 'a')
+
+def test_table_methods_query():
+    table = _create_table()
+
+    assert table.query("type == 'a' and order > 1") == table[[0,3]] and table.query("gene in ('gid_1', 'gid_5')", axis = 1) == table[:,[1,5]]
+    table.ridx_.createindex('order', 'sorted')
+    assert table.query('order >= 3') == table[[2,3,4]] and table.query("order < 3 or type == 'c'") == table[[0,1,4]]
+
+    vtab = table.query("type == 'a' and order < 3", view = True)
+    assert vtab == table[:2] and np.shares_memory(vtab.X_, table.X_)
+    assert not np.shares_memory(table.query("type == 'a'", view = True).X_, table.X_)
+    with pytest.raises(KeyError): table.query("type == 'a'", axis = 1)
+    with pytest.raises(IndexError): table.query("type == 'a'", axis = 2)
+
+def test_table_methods_iterrows():
+    table = _create_table()
+
+    rows = iter(table)
+    row = next(rows)
+    assert np.all(row == table.X_[0]) and np.shares_memory(row, table._dmatx) and not row.flags.writeable
+    with pytest.raises(ValueError): row[0] = -1
+    assert len(list(rows)) == 4
+
+    assert [n for n,_ in table.iterrows(withnames = True)] == ['row_%d' % i for i in range(5)]
+    assert all([np.all(r == d) for (_,r),d in zip(table.iterrows(withnames = True), table.X_)])
+    blks = list(table.iterrows(chunksize = 2))
+    assert [b.shape for b in blks] == [(2, 10), (2, 10), (1, 10)] and np.all(np.vstack(blks) == table.X_)
+    nams, blk = list(table.iterrows(withnames = True, chunksize = 3))[-1]
+    assert np.all(nams == ['row_3', 'row_4']) and np.all(blk == table.X_[3:])
+    assert [n for n,_ in Table(table.X_).iterrows(withnames = True)][-1] == '[4]'
+    assert np.all(list(Table(table.X_).iterrows(withnames = True, chunksize = 4))[1][0] == ['[4]'])
+
+def test_table_methods_openmemmap():
+    table = _create_table()
+    fname = 'test_table_openmemmap'
+
+    table.copy().offload(fname)
+    assert os.path.isfile(fname + '.meta')
+    mtab = Table.openmemmap(fname)
+    assert mtab == table and mtab.metadata['name'] == 'test_table' and isinstance(mtab._dmatx, np.memmap)
+    with pytest.raises(ValueError): mtab[0,0] = -1
+
+    mtab = Table.openmemmap(fname, mode = 'c')
+    mtab[0,0] = -1
+    assert mtab.X_[0,0] == -1 and Table.openmemmap(fname).X_[0,0] == 0
+
+    mtab = Table.openmemmap(fname, mode = 'r+')
+    mtab[0,0] = -1
+    mtab._dmatx.flush()
+    assert Table.openmemmap(fname).X_[0,0] == -1
+    mtab.onload(removefile = True)
+    assert mtab.X_[0,0] == -1 and not os.path.isfile(fname) and not os.path.isfile(fname + '.meta')
+
+    # sidecar follows names and index set on a writable mapping, private / read-only mappings leave it alone
+    mtab = table.copy().offload(fname)
+    mtab.rows_ = ['new_%d' % i for i in range(5)]
+    mtab.ridx_ = {'order': np.arange(5)}
+    mtab.put([0], Table(-np.ones((1,10), dtype = int), rownames = ['put_0'], colnames = table.cols_, rowindex = {'order': [9]}), inline = True)
+    otab = Table.openmemmap(fname, mode = 'c')
+    assert otab.rows_[0] == 'put_0' and otab.rows_[1] == 'new_1' and np.all(otab.ridx_.order == [9, 1, 2, 3, 4]) and otab.X_[0,0] == -1
+    otab.rows_ = table.rows_
+    assert Table.openmemmap(fname).rows_[0] == 'put_0'
+    mtab.onload(removefile = True)
+
+    with pytest.raises(ValueError): Table.openmemmap(fname, mode = 'w+')
+    table.savehdf(fname + '.hdf')
+    with pytest.raises(ValueError): Table.openmemmap(fname + '.hdf')
+    if os.path.isfile(fname + '.hdf'): os.remove(fname + '.hdf')
+
+def test_table_methods_copy_on_write_backed():
+    table = _create_table()
+    fname = 'test_table_cow_memmap'
+
+    table.offload(fname)
+    ttable = table.T
+    table[0,0] = 99
+    assert not np.shares_memory(ttable.X_, table.X_) and ttable.X_[0,0] == 0
+    assert table.onload(removefile = True).X_[0,0] == 99
+
+    table.copy().offload(fname)
+    mtab = Table.openmemmap(fname, mode = 'r+')
+    ctab = mtab.copy()
+    mtab[0,0] = -5
+    mtab._dmatx.flush()
+    assert isinstance(mtab._dmatx, np.memmap) and ctab.X_[0,0] == 99
+    assert Table.openmemmap(fname).X_[0,0] == -5
+    mtab.onload(removefile = True)
+
+def _shared_worker(handle):
+    table = Table.fromshared(handle)
+    table[0,0] = -1
+    table.releaseshared()
+
+def test_table_methods_shared():
+    table = _create_table()
+    ctable = deepcopy(table)
+
+    handle = table.toshared()
+    assert table == ctable and len(pkl.dumps(handle)) < 4096
+    assert 'X' in handle.layout and 'ridx:order' in handle.layout and 'ridx:type' not in handle.layout
+    stab = Table.fromshared(pkl.loads(pkl.dumps(handle)))
+    assert stab == ctable and stab.metadata['name'] == 'test_table'
+
+    table[1,1] = -2
+    assert stab.X_[1,1] == -2
+    stab.ridx_['order'][0] = 100
+    assert table.ridx_.order[0] == 2
+
+    proc = mp.get_context('fork').Process(target = _shared_worker, args = (handle,))
+    proc.start(); proc.join()
+    assert proc.exitcode == 0 and table.X_[0,0] == -1 and stab.X_[0,0] == -1
+
+    assert stab.releaseshared().X_[0,0] == -1
+    table.releaseshared()
+    stab[2,2] = -3
+    assert table.X_[2,2] == 22 and table.ridx_.order[0] == 2
+    with pytest.raises(FileNotFoundError): Table.fromshared(handle)
+
+    # views taken before the release keep the segment mapped
+    table = _create_table()
+    table.toshared()
+    vtab, x, rows, ridx = table.view_[:2], np.asarray(table), l(table.iterrows()), table.ridx_[:,1:3]
+    table.releaseshared()
+    assert vtab.X_.sum() == 190 and x.sum() == 1225 and rows[4].sum() == 445 and np.all(ridx.order == [1, 3])
+    with pytest.raises(TypeError): table.astype(object).toshared()
+
+def test_table_methods_pickle_buffers():
+    table = _create_table()
+
+    bufs = []
+    data = table.dumps(buffer_callback = bufs.append)
+    assert len(bufs) >= 2 and len(data) < len(table.dumps())
+    ltable = pkl.loads(data, buffers = bufs)
+    assert ltable == table and ltable.metadata['name'] == 'test_table'
+    assert np.shares_memory(ltable.X_, table.X_) # zero-copy when buffers are not transferred
+
+    table.offload('test_table_pickle_memmap')
+    ltable = pkl.loads(pkl.dumps(table, protocol = 5))
+    assert ltable == table and ltable._memmap is None and not isinstance(ltable._dmatx, np.memmap)
+    table.onload(removefile = True)
+
+def test_table_methods_portals_native():
+    table = _create_table()
+    fname = 'test_table_native'
+
+    assert table.save(fname) and os.path.isfile(os.path.join(fname, 'header.json'))
+    ltable = Table.load(fname)
+    assert ltable == table and ltable.metadata['extra'].val1 == 1 and isinstance(ltable._dmatx, np.memmap)
+    assert isinstance(ltable.ridx_._arrs['order'], np.memmap)
+    with pytest.raises(ValueError): ltable[0,0] = -1
+    ltable.ridx_['order'][0] = 100
+    assert Table.load(fname).ridx_.order[0] == 2
+
+    ltable = Table.openmemmap(fname, mode = 'r+')
+    ltable[0,0] = -1
+    ltable._dmatx.flush()
+    assert Table.load(fname).X_[0,0] == -1 and ltable.onload().X_[0,0] == -1
+
+    table.astype(str).save(fname)
+    assert Table.load(fname, mode = 'c') == table.astype(str)
+    Table(np.zeros((0, 3))).save(fname)
+    assert Table.load(fname).shape == (0, 3)
+
+    with pytest.raises(TypeError): table.astype(object).save(fname)
+    assert Table.load(fname).shape == (0, 3)
+    os.makedirs(fname + '_other', exist_ok = True)
+    with pytest.raises(IOError): table.save(fname + '_other')
+    with pytest.raises(ValueError): Table.load(fname, mode = 'w+')
+    shutil.rmtree(fname)
+    shutil.rmtree(fname + '_other')